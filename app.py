@@ -1,54 +1,435 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
-import requests
+import base64
+import binascii
+import compression
+import date_parsing
+import face_gallery
+import gift_assets
+import http_client
+import record_store
+import response_db
 import os
 from dotenv import load_dotenv
-from datetime import datetime
+import hashlib
+import hmac
 import json
+import logging
+import logging_setup
+import memory_index
+import random
 import resend
+import threading
+import time
 from datetime import datetime, timedelta
+from sheet_schema import NOTE_FIELDS, make_record_reader
 
 import resend.emails
 
 # Load environment variables
 load_dotenv()
 
+logging_setup.configure_logging()
+logger = logging.getLogger('app')
+
 # Get the Google Sheet URL from environment variable
 SHEET_URL = os.getenv('GOOGLE_SHEET_URL')
 RESEND_API_KEY = os.getenv('RESEND_API_KEY')
 EMAIL_FROM = os.getenv('EMAIL_FROM', 'onboarding@resend.dev')
 EMAIL_TO = os.getenv('EMAIL_TO', 'fineshyts@michaelamy5ever.com')
 
+# Background refresher: seconds between sheet ingests, +/- jitter fraction, and the longest backoff after failures
+SHEET_REFRESH_INTERVAL = float(os.getenv('SHEET_REFRESH_INTERVAL', '60'))
+SHEET_REFRESH_JITTER = float(os.getenv('SHEET_REFRESH_JITTER', '0.1'))
+SHEET_REFRESH_BACKOFF_MAX = float(os.getenv('SHEET_REFRESH_BACKOFF_MAX', '600'))
+# How long a request waits for the first snapshot after the process starts
+SHEET_COLD_START_TIMEOUT = float(os.getenv('SHEET_COLD_START_TIMEOUT', '30'))
+
+# Notes per /memories page, and per first page embedded in /hangout-data
+MEMORIES_PAGE_SIZE = int(os.getenv('MEMORIES_PAGE_SIZE', '50'))
+MEMORIES_MAX_PAGE_SIZE = 500
+
+# /trends defaults to this many days up to today, and refuses windows longer than TRENDS_MAX_DAYS
+TRENDS_DEFAULT_DAYS = int(os.getenv('TRENDS_DEFAULT_DAYS', '30'))
+TRENDS_MAX_DAYS = int(os.getenv('TRENDS_MAX_DAYS', '3660'))
+TRENDS_RESOLUTIONS = ('day', 'week', 'month')
+
+# Cache-Control sent with the dashboard JSON, by default clients revalidate with the ETag every time
+API_CACHE_CONTROL = os.getenv('API_CACHE_CONTROL', 'no-cache')
+
+# Token /face-gallery/enroll requires, enrolling over HTTP is off when unset
+FACE_ENROLL_TOKEN = os.getenv('FACE_ENROLL_TOKEN')
+
 # Initialize Resend
 if RESEND_API_KEY:
     resend.api_key = RESEND_API_KEY
 
+# Send Resend SDK calls through the shared HTTP session too
+_resend_client = http_client.make_resend_client()
+if _resend_client:
+    resend.default_http_client = _resend_client
+
 app = Flask(__name__)
 CORS(app, origins=["*"])  # Allow requests from any origin
 
+# Map the reference face gallery once at startup, workers share its pages
+face_gallery.get_gallery()
+
+# Hash the gift assets once for their ETags and fingerprinted URLs
+gift_assets.load_assets()
+
+@app.before_request
+def sample_request_logging():
+    # Decide once per request whether its debug output is kept
+    logging_setup.sample_request()
+
+@app.before_request
+def ensure_sheet_refresher():
+    # The refresher starts with the first request the app serves
+    start_sheet_refresher()
+
+@app.after_request
+def compress_json_response(response):
+    # Large JSON responses that are not pre-compressed are gzipped on the way out
+    return compression.compress_response(request, response)
+
+def get_public_sheet_url():
+    """Convert the sheet URL to the public JSON endpoint"""
+    if not SHEET_URL:
+        raise Exception("GOOGLE_SHEET_URL environment variable not set")
+    sheet_id = SHEET_URL.split('/d/')[1].split('/')[0]
+    return f'https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:json'
+
+def parse_sheet_text(text):
+    """Parse the raw gviz response text into the sheet JSON"""
+    # Google Sheets returns data wrapped in a function call, we need to extract it
+    json_text = text[47:-2]  # Remove the wrapper
+    return json.loads(json_text)
+
 def fetch_sheet_data():
     """Fetch data from public Google Sheet URL"""
     try:
-        if not SHEET_URL:
-            raise Exception("GOOGLE_SHEET_URL environment variable not set")
-        
-        # Convert to the public JSON endpoint
-        sheet_id = SHEET_URL.split('/d/')[1].split('/')[0]
-        public_url = f'https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:json'
-        
-        response = requests.get(public_url)
+        response = http_client.get('sheets', get_public_sheet_url())
         response.raise_for_status()
-        # print(response.text)
-        # Google Sheets returns data wrapped in a function call, we need to extract it
+        return parse_sheet_text(response.text)
+    except Exception as e:
+        logger.error("Error fetching sheet data: %s", e)
+        return None
+
+def ingest_sheet():
+    """Fetch the sheet and mirror it into the response database, skipping the write if the payload has not changed"""
+    try:
+        # Send back whatever validators the upstream gave us last time
+        headers = {}
+        if _sheet_ingest['etag']:
+            headers['If-None-Match'] = _sheet_ingest['etag']
+        if _sheet_ingest['last_modified']:
+            headers['If-Modified-Since'] = _sheet_ingest['last_modified']
+
+        response = http_client.get('sheets', get_public_sheet_url(), headers=headers)
+        if response.status_code == 304 and _sheet_ingest['content_hash']:
+            _sheet_cache_stats['unchanged'] += 1
+            logger.debug("Sheet not modified since %s", _sheet_ingest['content_hash'][:12])
+            return True
+        response.raise_for_status()
+
         text = response.text
-        json_text = text[47:-2]  # Remove the wrapper
+        content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        _sheet_ingest['etag'] = response.headers.get('ETag') or _sheet_ingest['etag']
+        _sheet_ingest['last_modified'] = response.headers.get('Last-Modified') or _sheet_ingest['last_modified']
+        stored_hash = _sheet_ingest['content_hash'] or response_db.get_state(response_db.get_connection(), 'content_hash')
+        if content_hash == stored_hash:
+            # Byte-identical payload, the database already holds it
+            _sheet_cache_stats['unchanged'] += 1
+            _sheet_ingest['content_hash'] = content_hash
+            logger.debug("Sheet payload unchanged since %s", content_hash[:12])
+            return True
+
+        records = process_sheet_data(parse_sheet_text(text))
+        if records is None:
+            logger.error("Sheet payload %s has no table", content_hash[:12])
+            return False
+        response_db.replace_records(records, content_hash)
+        _sheet_ingest['content_hash'] = content_hash
+        _sheet_cache_stats['ingests'] += 1
+        logger.info("Sheet payload changed, stored %s with %d records", content_hash[:12], len(records))
+        return True
+    except Exception as e:
+        logger.error("Error ingesting sheet data: %s", e)
+        return False
 
-        data = json.loads(json_text)
-        return data
+def get_first_memory_page(snapshot):
+    """First page of memories and the cursor to the rest, the part /hangout-data embeds"""
+    memories_and_worries = get_snapshot_view(snapshot, 'memories_and_worries')
+    return memory_index.get_page(get_memory_index(snapshot), memories_and_worries, limit=MEMORIES_PAGE_SIZE)
+
+def is_monogamous(processed_data):
+    """Check if relationship is monogamous"""
+    return not any(
+        'non monogamous' in (record.select_all_true or '').lower()
+        for record in processed_data['sorted_records']
+    )
+
+# How to compute each section of a snapshot, run at most once per snapshot and only when asked for
+SNAPSHOT_VIEWS = {
+    'status': lambda snapshot: get_status(snapshot['processed_data']),
+    'last_entries': lambda snapshot: get_last_entries(snapshot['processed_data']),
+    'memories_and_worries': lambda snapshot: get_memories_and_worries(snapshot['processed_data']),
+    'first_memory_page': get_first_memory_page,
+    'trend_data': lambda snapshot: get_trends(snapshot['processed_data']),
+    'monogamous': lambda snapshot: is_monogamous(snapshot['processed_data'])
+}
+
+# Sections /hangout-data can return, in the order ?fields= is normalized to
+HANGOUT_DATA_FIELDS = ('status', 'last_entries', 'memories_and_worries', 'trend_data', 'monogamous')
+# Endpoint bodies encoded with every snapshot, the full /hangout-data, /status and /last-entries
+SNAPSHOT_BODIES = ('hangout_data', 'status', 'last_entries')
+
+def new_snapshot(version, built_on, records, processed_data, memory_indexes=None):
+    """A snapshot whose views and encoded bodies are filled in on first use"""
+    return {
+        'version': version,
+        'built_on': built_on,
+        'records': records,
+        'processed_data': processed_data,
+        'lock': threading.RLock(),
+        'views': {},
+        'bodies': {},
+        'memory_indexes': memory_indexes if memory_indexes is not None else {}
+    }
+
+def get_snapshot_view(snapshot, name):
+    """A section of the snapshot, computed on first use and memoized"""
+    views = snapshot['views']
+    if name not in views:
+        with snapshot['lock']:
+            if name not in views:
+                views[name] = SNAPSHOT_VIEWS[name](snapshot)
+    return views[name]
+
+def get_hangout_data_payload(snapshot, fields):
+    """The /hangout-data body for the selected sections"""
+    payload = {}
+    for field in fields:
+        if field == 'memories_and_worries':
+            # The rest is paged in from /memories
+            payload['memories_and_worries'], payload['memories_next_cursor'] = get_snapshot_view(snapshot, 'first_memory_page')
+        else:
+            payload[field] = get_snapshot_view(snapshot, field)
+    return payload
+
+def encode_body(payload, levels=compression.SNAPSHOT_LEVELS):
+    """Encode a JSON body with a strong ETag over the bytes and its variants compressed at levels"""
+    # Same bytes jsonify would produce
+    body = app.json.response(payload).get_data()
+    return {
+        'body': body,
+        'etag': hashlib.sha256(body).hexdigest()[:32],
+        # Compressed once here instead of on every request
+        'variants': compression.compress_variants(body, levels)
+    }
+
+def get_snapshot_body(snapshot, name, fields=HANGOUT_DATA_FIELDS):
+    """An endpoint's encoded body ('hangout_data' for the given fields, 'status' or 'last_entries'), memoized per snapshot"""
+    key = (name, fields) if name == 'hangout_data' else name
+    bodies = snapshot['bodies']
+    if key not in bodies:
+        with snapshot['lock']:
+            if key not in bodies:
+                if name == 'hangout_data':
+                    # A ?fields= selection is encoded on the request that asks for it, so it gets the fast levels
+                    levels = compression.SNAPSHOT_LEVELS if fields == HANGOUT_DATA_FIELDS else compression.RESPONSE_LEVELS
+                    bodies[key] = encode_body(get_hangout_data_payload(snapshot, fields), levels)
+                else:
+                    bodies[key] = encode_body(get_snapshot_view(snapshot, name))
+    return bodies[key]
+
+def get_memory_index(snapshot, user=None, note_type=None):
+    """The snapshot's memory index for a user/type filter, built on first use"""
+    indexes = snapshot['memory_indexes']
+    index = indexes.get((user, note_type))
+    if index is None:
+        # Two requests racing here build the same index, either copy is fine
+        index = indexes[(user, note_type)] = memory_index.build_index(
+            get_snapshot_view(snapshot, 'memories_and_worries'), user, note_type)
+    return index
+
+def snapshot_response(encoded):
+    """Serve an encoded snapshot body in the best encoding the client accepts, or a 304 when its ETag still matches"""
+    encoding = compression.negotiate(request, encoded['variants'])
+    if encoding:
+        response = app.response_class(encoded['variants'][encoding], mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+        # Each encoding is its own representation, so it gets its own strong ETag
+        response.set_etag(f"{encoded['etag']}-{encoding}")
+    else:
+        response = app.response_class(encoded['body'], mimetype='application/json')
+        response.set_etag(encoded['etag'])
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = API_CACHE_CONTROL
+    return response.make_conditional(request)
+
+def load_snapshot(previous=None):
+    """Build a processed snapshot from the response database, reusing the previous one if nothing was written since"""
+    try:
+        today = datetime.now().toordinal()
+        if previous and previous['version'] == response_db.get_version():
+            if previous['built_on'] == today:
+                return previous
+            # Same responses, but the trends run up to today
+            snapshot = new_snapshot(previous['version'], today, previous['records'], previous['processed_data'],
+                                    previous['memory_indexes'])
+        else:
+            version, records = response_db.load_records()
+            # Version 0 means nothing was ever synced into this database, whatever rows it holds
+            if not version or not records:
+                return None
+            processed_data = process_records(records, previous['processed_data'] if previous else None)
+            _sheet_cache_stats['rebuilds'] += 1
+            logger.info("Rebuilt snapshot from database version %d with %d records", version, len(records))
+            snapshot = new_snapshot(version, today, records, processed_data)
+
+        # The fixed bodies are built and compressed here so their requests never wait on it
+        for name in SNAPSHOT_BODIES:
+            get_snapshot_body(snapshot, name)
+        return snapshot
     except Exception as e:
-        print(f"Error fetching sheet data: {e}")
+        logger.exception("Error loading responses from %s: %s", response_db.RESPONSE_DB_PATH, e)
         return None
 
+# Validators and payload hash of the last sheet ingest
+_sheet_ingest = {
+    'content_hash': None,
+    'etag': None,
+    'last_modified': None
+}
+
+# Process-level snapshot of the response database, swapped in whole by the refresher
+_sheet_cache_lock = threading.Lock()
+_sheet_refresh_lock = threading.Lock()
+_sheet_ready = threading.Event()
+_sheet_cache = {
+    'snapshot': None,
+    'published_at': None,
+    'refresher': None,
+    'failures': 0,
+    'next_refresh_at': None
+}
+_sheet_cache_stats = {
+    'hits': 0,
+    'misses': 0,
+    'refreshes': 0,
+    'refresh_errors': 0,
+    'unchanged': 0,
+    'ingests': 0,
+    'rebuilds': 0
+}
+
+def publish_snapshot(snapshot):
+    """Swap a snapshot in for request handlers"""
+    with _sheet_cache_lock:
+        if snapshot is not _sheet_cache['snapshot']:
+            _sheet_cache['snapshot'] = snapshot
+            _sheet_cache['published_at'] = time.time()
+    _sheet_ready.set()
+
+def refresh_sheet_cache():
+    """Ingest the sheet into the database and publish a snapshot of it"""
+    with _sheet_refresh_lock:
+        if _sheet_cache['snapshot'] is None:
+            # Serve what the database already has while Google is asked for news
+            snapshot = load_snapshot()
+            if snapshot:
+                publish_snapshot(snapshot)
+
+        ingested = ingest_sheet()
+        # Even if Google is unreachable, the database still has the last good copy
+        snapshot = load_snapshot(_sheet_cache['snapshot']) or _sheet_cache['snapshot']
+        if snapshot:
+            publish_snapshot(snapshot)
+        with _sheet_cache_lock:
+            if ingested:
+                _sheet_cache['failures'] = 0
+                _sheet_cache_stats['refreshes'] += 1
+            else:
+                _sheet_cache['failures'] += 1
+                _sheet_cache_stats['refresh_errors'] += 1
+                logger.warning("Sheet ingest failed %d time(s) in a row, serving the responses already in the database",
+                               _sheet_cache['failures'])
+        return snapshot
+
+def get_refresh_delay(failures):
+    """Seconds until the next refresh: the interval, backed off exponentially after failures, with jitter"""
+    # The exponent is capped, 2 ** failures as a float overflows after ~1024 failures in a row
+    delay = min(SHEET_REFRESH_INTERVAL * (2 ** min(failures, 16)), max(SHEET_REFRESH_BACKOFF_MAX, SHEET_REFRESH_INTERVAL))
+    # Spread refreshes out so instances started together do not poll Google in lockstep
+    return delay * random.uniform(1 - SHEET_REFRESH_JITTER, 1 + SHEET_REFRESH_JITTER)
+
+def run_sheet_refresher():
+    """Refresher thread: keep the snapshot hot until the process exits"""
+    while True:
+        try:
+            refresh_sheet_cache()
+        except Exception as e:
+            logger.exception("Sheet refresher error: %s", e)
+        finally:
+            # The first attempt is done either way, stop making cold requests wait for it
+            _sheet_ready.set()
+        try:
+            delay = get_refresh_delay(_sheet_cache['failures'])
+        except Exception as e:
+            # Never let the thread die, fall back to the plain interval
+            logger.exception("Sheet refresher delay error: %s", e)
+            delay = SHEET_REFRESH_INTERVAL
+        _sheet_cache['next_refresh_at'] = time.time() + delay
+        time.sleep(delay)
+
+def start_sheet_refresher():
+    """Start the background refresher once per process"""
+    with _sheet_cache_lock:
+        if _sheet_cache['refresher'] is not None:
+            return
+        _sheet_cache['refresher'] = threading.Thread(target=run_sheet_refresher, name='sheet-refresher', daemon=True)
+        _sheet_cache['refresher'].start()
+
+def get_sheet_snapshot():
+    """Return the snapshot the refresher last published, waiting for the first one on a cold start"""
+    with _sheet_cache_lock:
+        snapshot = _sheet_cache['snapshot']
+        _sheet_cache_stats['hits' if snapshot is not None else 'misses'] += 1
+    if snapshot is not None:
+        return snapshot
+
+    start_sheet_refresher()
+    _sheet_ready.wait(SHEET_COLD_START_TIMEOUT)
+    return _sheet_cache['snapshot']
+
+def get_snapshot_health():
+    """How old the served snapshot is and whether the refresher is keeping up"""
+    with _sheet_cache_lock:
+        snapshot = _sheet_cache['snapshot']
+        published_at = _sheet_cache['published_at']
+        next_refresh_at = _sheet_cache['next_refresh_at']
+        failures = _sheet_cache['failures']
+        refresher = _sheet_cache['refresher']
+    now = time.time()
+    return {
+        'snapshot_version': snapshot['version'] if snapshot is not None else None,
+        'snapshot_age_seconds': round(now - published_at, 3) if published_at is not None else None,
+        'next_refresh_in_seconds': round(max(next_refresh_at - now, 0), 3) if next_refresh_at is not None else None,
+        'consecutive_failures': failures,
+        'refresher_running': refresher is not None and refresher.is_alive()
+    }
+
+def get_sheet_cache_stats():
+    """Get hit/miss/refresh counters for the snapshot cache"""
+    with _sheet_cache_lock:
+        stats = dict(_sheet_cache_stats)
+    stats.update(get_snapshot_health())
+    stats['refresh_interval_seconds'] = SHEET_REFRESH_INTERVAL
+    stats['content_hash'] = _sheet_ingest['content_hash']
+    return stats
+
 def process_sheet_data(data):
     """Process the sheet data into the format we need"""
     if not data or 'table' not in data:
@@ -57,111 +438,86 @@ def process_sheet_data(data):
     rows = data['table']['rows']
     headers = [col['label'] for col in data['table']['cols']]
     
-    # Convert to array of objects
+    # Convert to compact records, dates are parsed once here so later stages never have to
+    read_record = make_record_reader(headers)
     records = []
     for row in rows:
-        record = {}
-        for i, cell in enumerate(row['c']):
-            if cell and 'f' in cell:
-                record[headers[i]] = cell['f']
-            else:
-                record[headers[i]] = cell['v'] if cell else ''
-        records.append(record)
+        values = [(cell['f'] if 'f' in cell else cell['v']) if cell else '' for cell in row['c']]
+        records.append(read_record(values))
     
     return records
 
-def parse_timestamp(ts):
-    # Try to parse common formats, fallback to string for broken/missing values
-    for fmt in ("%m/%d/%Y %H:%M:%S", "%m/%d/%y %H:%M:%S", "%m/%d/%Y", "%m/%d/%y"):
-        try:
-            return datetime.strptime(ts, fmt)
-        except Exception:
-            continue
-    return datetime.min  # Put unparseable/missing dates at the end
-
-def parse_date(date_str):
-    """Parse date strings like '6/29/25' or '6/29/2025'"""
-    if not date_str:
-        return datetime.min
-    
+def parse_level(value):
+    """Parse a 1-5 scale answer, 0 if it is blank or not a number"""
     try:
-        # Handle different date formats
-        if '/' in date_str:
-            parts = date_str.split('/')
-            month = int(parts[0])
-            day = int(parts[1])
-            year = int(parts[2])
-            
-            # Handle 2-digit years
-            if year < 100:
-                year += 2000
-                
-            return datetime(year, month, day)
-        else:
-            return datetime.min
-    except Exception:
-        return datetime.min
+        return int(value or '0')
+    except (TypeError, ValueError):
+        return 0
 
-def process_records(records):
-    """Process and sort all records for efficient access"""
-    # Sort records by date (most recent first), then by timestamp as tiebreaker
-    sorted_records = sorted(records, key=lambda x: (parse_date(x.get('What day is this for? ', '')).timestamp(), parse_timestamp(x.get('Timestamp', '')).timestamp()), reverse=True)
-    print([parse_date(r.get('What day is this for? ', '')).timestamp() for r in sorted_records])
-    # Separate entries by user (already sorted by timestamp)
-    amy_entries = [r for r in sorted_records if r.get('Who is filling this out right now.') == 'Amy']
-    michael_entries = [r for r in sorted_records if r.get('Who is filling this out right now.') == 'Michael']
-    
-    # Get hangout entries sorted by date (most recent first)
-    hangout_entries = [r for r in sorted_records if r.get('Did you hang out (in real life)? ') == 'Yes' and r.get('What day is this for? ')]
-    # hangout_entries.sort(key=lambda x: x['What day is this for? '], reverse=True)
-    
-    # Get Minecraft hangout entries sorted by date
-    minecraft_entries = [r for r in sorted_records if r.get('Did you hang out (in real life)? ') == 'Yes' and r.get('What day is this for? ') and 'We played Minecraft' in r.get('Check all that are true for this hangout.', '')]
-    # minecraft_entries.sort(key=lambda x: x['What day is this for? '], reverse=True)
-    
-    # Get kiss hangout entries sorted by date
-    kiss_entries = [r for r in sorted_records if r.get('Did you hang out (in real life)? ') == 'Yes' and ('We held hands and kissed' in r.get('Check all that are true for this hangout.', '') or 'kissed' in r.get('Check all that are true for this hangout.', ''))]
-    # kiss_entries.sort(key=lambda x: x['What day is this for? '], reverse=True)
-    print(len(kiss_entries), [r['What day is this for? '] for r in kiss_entries])
-    # Collect memories and worries (already sorted by timestamp from sorted_records)
+def get_activity_mask(activities):
+    """Fold the hangout checkboxes into record_store activity bits"""
+    mask = 0
+    for activity in activities.split(','):
+        activity = activity.strip()
+        if activity == 'We played Minecraft':
+            mask |= record_store.MINECRAFT
+        elif 'kissed' in activity:
+            mask |= record_store.KISS
+        elif activity == 'We had a sleepover':
+            mask |= record_store.SLEEPOVER
+    return mask
+
+def sort_records(records):
+    """Sort records by date (most recent first), then by timestamp as tiebreaker"""
+    # Sort keys are computed once and reused for the debug output
+    keyed_records = [((r.parsed_day.timestamp(), r.parsed_timestamp.timestamp()), r) for r in records]
+    keyed_records.sort(key=lambda item: item[0], reverse=True)
+    if logging_setup.debug_enabled(logger):
+        logger.debug("Sorted record days: %s", [key[0] for key, _ in keyed_records])
+    return [r for _, r in keyed_records]
+
+def classify_records(sorted_records):
+    """Split sorted records into the per-user, activity and notes lists in a single pass"""
+    amy_entries = []
+    michael_entries = []
+    hangout_entries = []
+    minecraft_entries = []
+    kiss_entries = []
     memories_and_worries = []
+
+    # Every bucket keeps the sorted order of sorted_records
     for record in sorted_records:
-        user = record.get('Who is filling this out right now.', '')
-        timestamp = record.get('Timestamp', '')
-        date = record.get('What day is this for? ', '')
-        
-        # Collect good memories
-        memory = record.get("What's a good memory from this hangout (or relationship)? ", '')
-        if memory and memory.strip():
-            memories_and_worries.append({
-                'user': user,
-                'type': 'memory',
-                'text': memory,
-                'timestamp': timestamp,
-                'date': date
-            })
-        
-        # Collect worries
-        worry = record.get("What's something you're worried about? ", '')
-        if worry and worry.strip():
-            memories_and_worries.append({
-                'user': user,
-                'type': 'worry',
-                'text': worry,
-                'timestamp': timestamp,
-                'date': date
-            })
-        
-        # Collect "anything else" notes
-        other = record.get("Anything else to note?", '')
-        if other and other.strip():
-            memories_and_worries.append({
-                'user': user,
-                'type': 'other',
-                'text': other,
-                'timestamp': timestamp,
-                'date': date
-            })
+        user = record.user
+        date = record.day_for
+
+        if user == 'Amy':
+            amy_entries.append(record)
+        elif user == 'Michael':
+            michael_entries.append(record)
+
+        if record.hangout == 'Yes':
+            activities = record.check_all_true or ''
+            if date:
+                hangout_entries.append(record)
+                if 'We played Minecraft' in activities:
+                    minecraft_entries.append(record)
+            if 'kissed' in activities:
+                kiss_entries.append(record)
+
+        # Collect good memories, worries and "anything else" notes
+        for note_type, attr in NOTE_FIELDS:
+            text = getattr(record, attr)
+            if text and text.strip():
+                memories_and_worries.append({
+                    'user': user,
+                    'type': note_type,
+                    'text': text,
+                    'timestamp': record.timestamp,
+                    'date': date
+                })
+
+    if logging_setup.debug_enabled(logger):
+        logger.debug("%d kiss entries: %s", len(kiss_entries), [r.day_for for r in kiss_entries])
     return {
         'sorted_records': sorted_records,
         'amy_entries': amy_entries,
@@ -172,22 +528,62 @@ def process_records(records):
         'memories_and_worries': memories_and_worries
     }
 
+def build_record_columns(records):
+    """Turn records into column values for the record store, one row per record"""
+    columns = record_store.new_columns()
+    for record in records:
+        day = get_date_from_record(record)
+        columns['day'].append(day.toordinal() if day else -1)
+        columns['timestamp'].append(record.parsed_timestamp.timestamp())
+        columns['user'].append(record_store.USER_IDS.get(record.user, -1))
+        columns['strength'].append(parse_level(record.relationship_strength))
+        columns['stress'].append(parse_level(record.stress_level))
+        columns['hangout'].append(record.hangout == 'Yes')
+        columns['activities'].append(get_activity_mask(record.check_all_true or ''))
+        columns['crashout'].append(record.crash_out == 'Yes' or record.argued == 'Yes')
+        columns['long_distance'].append(record.long_distance == 'Yes')
+    return columns
+
+def process_records(records, previous=None):
+    """Process and sort all records for efficient access"""
+    processed_data = classify_records(sort_records(records))
+
+    # Form responses are appended to the sheet, so when the previous snapshot's rows are
+    # unchanged only the new rows are added to its record store and day index
+    store, day_index, new_records = None, None, records
+    if previous and 'record_store' in previous:
+        previous_records = previous['records']
+        if len(records) >= len(previous_records) and records[:len(previous_records)] == previous_records:
+            store, day_index = previous['record_store'], previous['day_index']
+            new_records = records[len(previous_records):]
+    if store is None:
+        store, day_index = record_store.new_store(max(2 * len(records), 256)), record_store.new_day_index()
+
+    store, new_rows = record_store.append_rows(store, build_record_columns(new_records))
+    processed_data['records'] = records
+    processed_data['record_store'] = store
+    processed_data['day_index'] = record_store.update_day_index(day_index, store, new_rows)
+    processed_data['entry_index'] = record_store.build_entry_index(processed_data['day_index'])
+    return processed_data
+
 def get_status(processed_data):
     """Get status summary from processed data"""
-    print(processed_data['sorted_records'][0])
+    if logging_setup.debug_enabled(logger) and processed_data['sorted_records']:
+        logger.debug("Latest record: %s", processed_data['sorted_records'][0])
 
+    # The activity lists are newest first and hold every entry, so a later same-day correction wins
     return {
-        'is_long_distance': processed_data['sorted_records'][0]['Are you long distance right now?'] if processed_data['sorted_records'] else None,
-        'last_hangout_date': processed_data['hangout_entries'][0]['What day is this for? '] if processed_data['hangout_entries'] else None,
-        'last_minecraft_date': processed_data['minecraft_entries'][0]['What day is this for? '] if processed_data['minecraft_entries'] else None,
-        'last_kiss_date': processed_data['kiss_entries'][0]['What day is this for? '] if processed_data['kiss_entries'] else None
+        'is_long_distance': processed_data['sorted_records'][0].long_distance if processed_data['sorted_records'] else None,
+        'last_hangout_date': processed_data['hangout_entries'][0].day_for if processed_data['hangout_entries'] else None,
+        'last_minecraft_date': processed_data['minecraft_entries'][0].day_for if processed_data['minecraft_entries'] else None,
+        'last_kiss_date': processed_data['kiss_entries'][0].day_for if processed_data['kiss_entries'] else None
     }
 
 def get_last_entries(processed_data):
     """Get last entries for each user from processed data"""
     return {
-        'amy': processed_data['amy_entries'][0] if processed_data['amy_entries'] else None,
-        'michael': processed_data['michael_entries'][0] if processed_data['michael_entries'] else None
+        'amy': processed_data['amy_entries'][0].to_dict() if processed_data['amy_entries'] else None,
+        'michael': processed_data['michael_entries'][0].to_dict() if processed_data['michael_entries'] else None
     }
 
 def get_memories_and_worries(processed_data):
@@ -195,307 +591,63 @@ def get_memories_and_worries(processed_data):
     return processed_data['memories_and_worries']
 
 def get_trends(processed_data):
-    """Get 30-day trend data for graphing"""
-    from datetime import datetime, timedelta
-    
-    # Get records from the last 30 days
-    # thirty_days_ago = datetime.now() - timedelta(days=30)
-    
-    # Filter records from last 30 days
-    recent_records = []
-    for record in processed_data['sorted_records']:
-        record_date = get_date_from_record(record)
-        # if record_date and record_date >= thirty_days_ago:
-        recent_records.append(record)
-    
-    # Create a dictionary to store daily data
-    daily_data = {}
-    for record in recent_records:
-        date_key = get_date_from_record(record).strftime('%Y-%m-%d')
-        if date_key not in daily_data:
-            daily_data[date_key] = {
-                'amy': None,
-                'michael': None
-            }
-        
-        user = record.get('Who is filling this out right now.', '')
-        if user in ['Amy', 'Michael']:
-            daily_data[date_key][user.lower()] = record
-    
-    # Generate complete 30-day dataset (backfill missing days)
-    dates = []
-    relationship_strength = []
-    amy_stress = []
-    michael_stress = []
-    hangouts = []
-    kisses = []
-    minecraft = []
-    crashouts_or_arguments = []
-    
-    # Start from 30 days ago and go to today
-    current_date = get_date_from_record(processed_data['sorted_records'][-1])
-    while current_date <= datetime.now():
-        date_str = current_date.strftime('%Y-%m-%d')
-        dates.append(date_str)
-        
-        day_data = daily_data.get(date_str, {'amy': None, 'michael': None})
-        
-        # Get relationship strength (average of both users if available)
-        amy_strength = None
-        michael_strength = None
-        if day_data['amy']:
-            try:
-                amy_strength = int(day_data['amy'].get('How strong do you think our relationship is?', '0') or '0')
-            except:
-                amy_strength = 0
-        if day_data['michael']:
-            try:
-                michael_strength = int(day_data['michael'].get('How strong do you think our relationship is?', '0') or '0')
-            except:
-                michael_strength = 0
-        
-        # Average strength (or use single value if only one available)
-        if amy_strength is not None and michael_strength is not None:
-            avg_strength = (amy_strength + michael_strength) / 2
-        elif amy_strength is not None:
-            avg_strength = amy_strength
-        elif michael_strength is not None:
-            avg_strength = michael_strength
-        else:
-            avg_strength = None
-        relationship_strength.append(avg_strength)
-        
-        # Get stress levels
-        amy_stress_val = None
-        michael_stress_val = None
-        if day_data['amy']:
-            try:
-                amy_stress_val = int(day_data['amy'].get('How stressed are you about things outside of our relationship? ', '0') or '0')
-            except:
-                amy_stress_val = 0
-        if day_data['michael']:
-            try:
-                michael_stress_val = int(day_data['michael'].get('How stressed are you about things outside of our relationship? ', '0') or '0')
-            except:
-                michael_stress_val = 0
-        
-        amy_stress.append(amy_stress_val)
-        michael_stress.append(michael_stress_val)
-        
-        # Check for hangout activities
-        hangout_activities = set()
-        kiss_day = 0
-        minecraft_day = 0
-        hangout_day = 0
-        crashout_or_argument_day = 0
-        
-        for user_data in [day_data['amy'], day_data['michael']]:
-            if user_data and user_data.get('Did you hang out (in real life)? ') == 'Yes':
-                hangout_day = 1
-                activities = user_data.get('Check all that are true for this hangout.', '')
-                if activities:
-                    hangout_activities.update(activities.split(','))
-        
-        if 'We held hands and kissed' in hangout_activities or 'kissed' in str(hangout_activities):
-            kiss_day = 1
-        if 'We played Minecraft' in hangout_activities:
-            minecraft_day = 1
-        
-        # Check for crashouts or arguments
-        for user_data in [day_data['amy'], day_data['michael']]:
-            if user_data:
-                crashout_key = "Did you have any crash outs about us? \n\nSomething counts as a crash out if you spent >30 minutes worrying about the relationship, or had a bad thought that lasted multiple days. "
-                argument_key = "Did we argue? \n\nSomething counts as an argument if one party felt anger about something, and brought it up, and it was not immediately resolved. "
-                
-                if (user_data.get(crashout_key, '') == 'Yes' or 
-                    user_data.get(argument_key, '') == 'Yes'):
-                    crashout_or_argument_day = 1
-                    break
-        
-        hangouts.append(hangout_day)
-        kisses.append(kiss_day)
-        minecraft.append(minecraft_day)
-        crashouts_or_arguments.append(crashout_or_argument_day)
-        
-        current_date += timedelta(days=1)
-    
-    return {
-        'dates': dates,
-        'relationship_strength': relationship_strength,
-        'amy_stress': amy_stress,
-        'michael_stress': michael_stress,
-        'hangouts': hangouts,
-        'kisses': kisses,
-        'minecraft': minecraft,
-        'crashouts_or_arguments': crashouts_or_arguments
-    }
+    """Get daily trend data for graphing, from the first recorded day up to today"""
+    day_index = processed_data['day_index']
+    end = datetime.now().toordinal()
+    start = day_index['start'] if day_index['start'] is not None else end
+
+    # Read each day's entries from the day index instead of walking every record
+    trends = record_store.compute_trends(processed_data['record_store'], day_index, start, end)
+    trends['dates'] = [datetime.fromordinal(day).strftime('%Y-%m-%d') for day in range(start, end + 1)]
+    return trends
+
+def get_trends_window(processed_data, start, end, resolution='day'):
+    """Get trend data for [start, end] (date ordinals), one point per day, week or month"""
+    store = processed_data['record_store']
+    day_index = processed_data['day_index']
+    if resolution == 'day':
+        trends = record_store.compute_trends(store, day_index, start, end)
+        days = range(start, end + 1)
+    else:
+        # Long ranges are folded into weekly/monthly buckets, labelled by their first day in the window
+        trends = record_store.compute_trend_buckets(store, day_index, start, end, resolution)
+        days = trends.pop('starts')
+    trends['dates'] = [datetime.fromordinal(day).strftime('%Y-%m-%d') for day in days]
+    return trends
 
 def is_record_from_last_7_days(record):
     seven_days_ago = datetime.now() - timedelta(days=7)
 
-    date_str = record.get('What day is this for? ', '')
-    if not date_str:
+    if not record.day_for:
         return False
     
-    # Use the parse_date function for consistency
-    date = parse_date(date_str)
+    # Use the date parsed at ingest for consistency
+    date = record.parsed_day
     return date >= seven_days_ago
 
             
 def get_date_from_record(record):
-    # print(f"get_date_from_record: {record.get('What day is this for? ', 'No date')}")
-    date_str = record.get('What day is this for? ', '')
-    if not date_str:
+    if not record.day_for:
         return None
 
-    # Use the parse_date function for consistency
-    parsed_date = parse_date(date_str)
+    # Use the date parsed at ingest for consistency
+    parsed_date = record.parsed_day
     return parsed_date if parsed_date != datetime.min else None
 
-def generate_weekly_stats_from_data(processed_data):
-
-    sorted_records = processed_data['sorted_records']
-    amy_entries = processed_data['amy_entries']
-    michael_entries = processed_data['michael_entries']
-    hangout_entries = processed_data['hangout_entries']
-    minecraft_entries = processed_data['minecraft_entries']
-    kiss_entries = processed_data['kiss_entries']
-    memories_and_worries = processed_data['memories_and_worries']
+def get_window_stats(processed_data, ends, window):
+    """Weekly-email style stats for the window-day span ending on each of ends (date ordinals)"""
+    results = record_store.compute_sliding_stats(processed_data['record_store'], processed_data['day_index'],
+                                                processed_data['entry_index'], ends, window)
+    for stats in results:
+        stats['start'] = datetime.fromordinal(stats['start']).strftime('%Y-%m-%d')
+        stats['end'] = datetime.fromordinal(stats['end']).strftime('%Y-%m-%d')
+    return results
 
-    print("STARTING BACKFILL FOR AMY")
-    amy_records_from_last_7_days = backfill_missing_dates_for_week(amy_entries[:9])
-    print("STARTING BACKFILL FOR MICHAEL")
-    michael_records_from_last_7_days = backfill_missing_dates_for_week(michael_entries[:9])
-    print("FINISHED BACKFILL")
-
-    return get_data_from_backfilled_records(michael_records_from_last_7_days, amy_records_from_last_7_days)
-
-def backfill_missing_dates_for_week(records):
-    records = records[::-1]
-    seven_days_ago = datetime.now() - timedelta(days=7)
-    print(f"7 days ago: {seven_days_ago}")
-    last_record = records[0]
-    for record in records:
-        record_date = get_date_from_record(record)
-        if record_date >= seven_days_ago:
-            # Once we reach 7 days ago, stop
-            break 
-        last_record = record
-
-    last_record_date = get_date_from_record(last_record)
-    print(f"last record date: {last_record_date}")
-    backfilled_records = []
-    last_date = seven_days_ago
-    curr_record = records.pop(0)
-
-    while last_date <  datetime.now():
-
-        while get_date_from_record(curr_record) < last_date - timedelta(days=1) and records:
-            curr_record = records.pop(0)
-
-        print(f"curr_record: {get_date_from_record(curr_record)}")
-        # print(get_date_from_record(curr_record), last_date)
-        if get_date_from_record(curr_record).month == last_date.month and get_date_from_record(curr_record).day == last_date.day:
-            print(f"{get_date_from_record(curr_record)} found")
-            record_to_append = curr_record.copy()
-            last_record = curr_record
-            # print(record_to_append.get("Did you hang out (in real life)? ", "No, everything is good"))
-            # print(record_to_append.get("How strong do you think our relationship is?", "No, everything is good"))
-            # print(record_to_append['Did you have any crash outs about us? \n\nSomething counts as a crash out if you spent >30 minutes worrying about the relationship, or had a bad thought that lasted multiple days. '])
-        else:
-            print(f"backfilling {last_date}")
-            # print(last_record)
-            record_to_append = {}
-            record_to_append['What day is this for? '] = last_date.strftime("%m/%d/%Y")
-            record_to_append['Did you hang out (in real life)? '] = 'No'
-            record_to_append['Select all that you feel is true '] = ''
-            record_to_append['Who is filling this out right now.'] = last_record.get('Who is filling this out right now.', '')
-            record_to_append['Timestamp'] = last_record.get('Timestamp', '')
-            record_to_append['Are you long distance right now?'] = last_record.get('Are you long distance right now?', '')
-            record_to_append['How strong do you think our relationship is?'] = last_record.get('How strong do you think our relationship is?', '')
-            record_to_append['How stressed are you about things outside of our relationship? '] = last_record.get('How stressed are you about things outside of our relationship? ', '')            # print(f"{get_date_from_record(record_to_append)} backfilled")
-            record_to_append['Do you still like me? '] = last_record.get('Do you still like me? ')
-            record_to_append['Did we argue? \n\nSomething counts as an argument if one party felt anger about something, and brought it up, and it was not immediately resolved. '] = 'No, everything is good.'
-            record_to_append['Did you have any crash outs about us? \n\nSomething counts as a crash out if you spent >30 minutes worrying about the relationship, or had a bad thought that lasted multiple days. '] = 'No, everything is good.'
-        backfilled_records.append(record_to_append)
-        last_date += timedelta(days=1)
-
-    return backfilled_records    
-
-def get_data_from_backfilled_records(backfilled_records_michael, backfilled_records_amy):
-    """Get data from backfilled records"""
-    num_hangouts = 0 
-    num_crashouts_or_arguments = 0 
-    num_calls = 0
-    num_kisses = 0 
-    num_minecraft = 0 
-    strength_levels = [] 
-    amy_stress_levels = []
-    michael_stress_levels = [] 
-    days_long_distance = 0
-    num_sleepovers = 0
-    for i in range(7):
-        michael_record = backfilled_records_michael[i]
-        amy_record = backfilled_records_amy[i]
-        if michael_record.get('Did you hang out (in real life)? ') == 'Yes' or amy_record.get('Did you hang out (in real life)? ') == 'Yes':
-            num_hangouts += 1
-
-            hangout_activity_list = set()
-            print(michael_record.get("Check all that are true for this hangout.", "none").split(','))
-            # print(michael_record["Check all that are true for this hangout."])
-            hangout_activity_list.update(michael_record.get("Check all that are true for this hangout.", "").split(",")) 
-            hangout_activity_list.update(amy_record.get("Check all that are true for this hangout.", "").split(",")) 
-            if hangout_activity_list:
-                if ' We held hands and kissed' in hangout_activity_list:
-                    num_kisses += 1
-                if 'We played Minecraft' in hangout_activity_list:
-                    num_minecraft += 1
-                if ' We had a sleepover' in hangout_activity_list:
-                    num_sleepovers += 1
-        if michael_record.get('Are you long distance right now?') == 'Yes' or amy_record.get('Are you long distance right now?') == 'Yes':
-            days_long_distance += 1
-        crashout_key = "Did you have any crash outs about us? \n\nSomething counts as a crash out if you spent >30 minutes worrying about the relationship, or had a bad thought that lasted multiple days. "
-        argument_key = "Did we argue? \n\nSomething counts as an argument if one party felt anger about something, and brought it up, and it was not immediately resolved. "
-        had_crashout_or_argument = 'Yes' in (michael_record.get(crashout_key, "") + amy_record.get(crashout_key, "") + michael_record.get(argument_key, "") + amy_record.get(argument_key, ""))
-        if had_crashout_or_argument:
-            num_crashouts_or_arguments += 1
-        # if michael_record.get('Did you hang out (in real life)? ') == 'Yes' and michael_record.get('Check all that are true for this hangout.', '').lower() == 'kiss':
-        #     num_kisses += 1
-        # if michael_record.get('Did you hang out (in real life)? ') == 'Yes' and michael_record.get('Check all that are true for this hangout.', '').lower() == 'minecraft':
-        #     num_minecraft += 1
-
-        strength_levels.append(michael_record.get('How strong do you think our relationship is?', '5'))
-        strength_levels.append(amy_record.get('How strong do you think our relationship is?', '5'))
-        amy_stress_levels.append(amy_record.get('How stressed are you about things outside of our relationship? ', '1'))
-        michael_stress_levels.append(michael_record.get('How stressed are you about things outside of our relationship? ', '1'))
-        # if michael_record.get('Did you hang out (in real life)? ') == 'Yes' and michael_record.get('Check all that are true for this hangout.', '').lower() == 'kiss':
-   
-    print(michael_stress_levels)
-    print(amy_stress_levels)
-    print(strength_levels)
-    average_michael_stress = sum(int(level) for level in michael_stress_levels) / len(michael_stress_levels)
-    average_amy_stress = sum(int(level) for level in amy_stress_levels) / len(amy_stress_levels)
-    average_strength = sum(int(level) for level in strength_levels) / len(strength_levels)
-    print(f"average_michael_stress: {average_michael_stress}")
-    print(f"average_amy_stress: {average_amy_stress}")
-    print(f"average_strength: {average_strength}")
-    print(f"num_hangouts: {num_hangouts}")
-    print(f"num_sleepovers: {num_sleepovers}")
-    print(f"num_kisses: {num_kisses}")
-    print(f"num_minecraft: {num_minecraft}")
-    print(f"num_crashouts_or_arguments: {num_crashouts_or_arguments}")
-    print(f"num_long_distance: {days_long_distance}")
-    return {
-        'michael_stress_levels': michael_stress_levels,
-        'amy_stress_levels': amy_stress_levels,
-        'average_strength': average_strength,
-        'num_hangouts': num_hangouts,
-        'num_sleepovers': num_sleepovers,
-        'num_kisses': num_kisses,
-        'num_minecraft': num_minecraft,
-        'num_crashouts_or_arguments': num_crashouts_or_arguments,
-        'num_long_distance': days_long_distance,
-    }
+def generate_weekly_stats_from_data(processed_data):
+    """Get weekly email stats for the 7 days before today"""
+    today = datetime.now().toordinal()
+    return record_store.compute_window_stats(processed_data['record_store'], processed_data['day_index'],
+                                             processed_data['entry_index'], today - 7, today - 1)
 
 def generate_weekly_email(data):
     """Generate weekly email content"""
@@ -601,25 +753,21 @@ def send_weekly_email():
     """Send weekly email with relationship updates"""
     try:
         if not RESEND_API_KEY:
-            print("RESEND_API_KEY not set")
+            logger.warning("RESEND_API_KEY not set")
             return False
         
-        print(f"Using API key: {RESEND_API_KEY[:10]}...")
-        print(f"From email: {EMAIL_FROM}")
-        print(f"To emails: {EMAIL_TO}")
+        logger.debug("From email: %s, to emails: %s", EMAIL_FROM, EMAIL_TO)
             
-        # Fetch and process data
-        sheet_data = fetch_sheet_data()
-        if not sheet_data:
-            print("Failed to fetch sheet data")
+        # Always ingest the latest sheet for the email, unchanged payloads reuse the cached processing
+        snapshot = refresh_sheet_cache()
+        if not snapshot:
+            logger.error("Failed to fetch sheet data")
             return False
             
-        records = process_sheet_data(sheet_data)
-        if not records:
-            print("Failed to process sheet data")
+        processed_data = snapshot['processed_data']
+        if not processed_data:
+            logger.error("Failed to process sheet data")
             return False
-            
-        processed_data = process_records(records)
         
         # Generate email content
         weekly_data = generate_weekly_stats_from_data(processed_data)
@@ -628,13 +776,12 @@ def send_weekly_email():
         # Send email
         email_to_list = [email.strip() for email in EMAIL_TO.split(',')]
         
-        print(f"Sending email to: {email_to_list}")
-        print(f"API key (first 10 chars): {RESEND_API_KEY[:10] if RESEND_API_KEY else 'None'}...")
-        print(f"HTML content length: {len(html_content)} characters")
+        logger.info("Sending weekly email to %s (%d characters of HTML)", email_to_list, len(html_content))
         
         try:
 
-            response = requests.post(
+            response = http_client.post(
+                'resend',
                 "https://api.resend.com/emails",
                 headers={
                     "Authorization": f"Bearer {RESEND_API_KEY}",
@@ -655,19 +802,14 @@ def send_weekly_email():
             #     "html": html_content
             # })
             
-            print(response.json())
+            logger.info("Resend response: %s", response.json())
             return response.json()
         except resend.exceptions.ResendError as e:
-            print(f"Resend API Error: {e}")
-            print(f"Error details: {getattr(e, 'message', 'No message')}")
-            print(f"Error code: {getattr(e, 'code', 'No code')}")
+            logger.error("Resend API Error: %s (details: %s, code: %s)", e, getattr(e, 'message', 'No message'), getattr(e, 'code', 'No code'))
             raise
         
     except Exception as e:
-        print(f"Error sending email: {e}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Error sending email: %s", e)
         return False
 
 @app.route('/')
@@ -677,11 +819,16 @@ def home():
         "endpoints": {
             "/status": "Get status summary only",
             "/last-entries": "Get last entries for each user",
-            "/hangout-data": "Get all data (status, last entries, memories, worries)",
+            "/hangout-data": "Get all data (status, last entries, first page of memories, worries), ?fields= picks sections",
+            "/memories": "Page through memories, worries and notes (?user=&type=&limit=&cursor=)",
+            "/trends": "Trend series for a date range (?from=&to=&resolution=day|week|month)",
+            "/stats": "Weekly-email stats over any window (?window=&end=&from=&step=)",
             "/test": "Test endpoint",
+            "/metrics": "Snapshot cache, sheet ingest, upstream latency and date parser counters",
             "/send-email": "Send weekly email",
             "/test-email": "Test email endpoint",
             "/face-match": "Face matching endpoint",
+            "/face-gallery/enroll": "Add reference faces to the face-match gallery",
             "/gift-verify": "Gift verification endpoint",
             "/gift-assets/<path:filename>": "Gift asset endpoint"
         }
@@ -690,89 +837,157 @@ def home():
 @app.route('/hangout-data')
 def hangout_data():
     try:
-        # Fetch data from public sheet
-        sheet_data = fetch_sheet_data()
-        if not sheet_data:
+        # ?fields=status,trend_data,... picks sections, all of them by default
+        fields = HANGOUT_DATA_FIELDS
+        if request.args.get('fields'):
+            requested = {field.strip() for field in request.args['fields'].split(',') if field.strip()}
+            unknown = requested.difference(HANGOUT_DATA_FIELDS)
+            if unknown:
+                return jsonify({"error": f"Unknown fields {', '.join(sorted(unknown))}, expected any of {', '.join(HANGOUT_DATA_FIELDS)}"}), 400
+            fields = tuple(field for field in HANGOUT_DATA_FIELDS if field in requested)
+
+        # Served from the snapshot the background refresher keeps hot
+        snapshot = get_sheet_snapshot()
+        if not snapshot:
             return jsonify({"error": "Failed to fetch sheet data"}), 500
         
-        # Process the data
-        records = process_sheet_data(sheet_data)
-        if not records:
-            return jsonify({"error": "Failed to process sheet data"}), 500
-        
-        # Process and sort all records once
-        processed_data = process_records(records)
-        
-        # Get status summary
-        status_data = get_status(processed_data)
-        
-        # Get last entries for each user
-        last_entries_data = get_last_entries(processed_data)
-        
-        # Get all memories and worries
-        memories_and_worries = get_memories_and_worries(processed_data)
-        
-        # Get 30-day trend data
-        trend_data = get_trends(processed_data)
-        
-        # Check if relationship is monogamous
-        monogamous = not any(
-            'non monogamous' in (record.get('Select all that you feel is true ', '') or '').lower()
-            for record in records
-        )
-        
-        return jsonify({
-            'status': status_data,
-            'last_entries': last_entries_data,
-            'memories_and_worries': memories_and_worries,
-            'trend_data': trend_data,
-            'monogamous': monogamous
-        })
+        # Each section and body is built once per snapshot, unchanged data is a 304
+        return snapshot_response(get_snapshot_body(snapshot, 'hangout_data', fields))
         
     except Exception as e:
+        logger.exception("Error in %s: %s", request.path, e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/status')
 def status():
     try:
-        sheet_data = fetch_sheet_data()
-        if not sheet_data:
+        snapshot = get_sheet_snapshot()
+        if not snapshot:
             return jsonify({"error": "Failed to fetch sheet data"}), 500
         
-        records = process_sheet_data(sheet_data)
-        if not records:
-            return jsonify({"error": "Failed to process sheet data"}), 500
-        
-        # Process and sort all records once
-        processed_data = process_records(records)
-        
-        return jsonify(get_status(processed_data))
+        return snapshot_response(get_snapshot_body(snapshot, 'status'))
     except Exception as e:
+        logger.exception("Error in %s: %s", request.path, e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/last-entries')
 def last_entries():
     try:
-        sheet_data = fetch_sheet_data()
-        if not sheet_data:
+        snapshot = get_sheet_snapshot()
+        if not snapshot:
             return jsonify({"error": "Failed to fetch sheet data"}), 500
         
-        records = process_sheet_data(sheet_data)
-        if not records:
-            return jsonify({"error": "Failed to process sheet data"}), 500
-        
-        # Process and sort all records once
-        processed_data = process_records(records)
-        
-        return jsonify(get_last_entries(processed_data))
+        return snapshot_response(get_snapshot_body(snapshot, 'last_entries'))
     except Exception as e:
+        logger.exception("Error in %s: %s", request.path, e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/memories')
+def memories():
+    try:
+        user = request.args.get('user') or None
+        note_type = request.args.get('type') or None
+        if user is not None and user not in record_store.USER_IDS:
+            return jsonify({"error": f"Unknown user {user!r}, expected one of {', '.join(record_store.USER_IDS)}"}), 400
+        if note_type is not None and note_type not in memory_index.NOTE_TYPES:
+            return jsonify({"error": f"Unknown type {note_type!r}, expected one of {', '.join(memory_index.NOTE_TYPES)}"}), 400
+        try:
+            limit = int(request.args.get('limit', MEMORIES_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "limit must be a number"}), 400
+        limit = max(1, min(limit, MEMORIES_MAX_PAGE_SIZE))
+
+        snapshot = get_sheet_snapshot()
+        if not snapshot:
+            return jsonify({"error": "Failed to fetch sheet data"}), 500
+
+        index = get_memory_index(snapshot, user, note_type)
+        try:
+            page, next_cursor = memory_index.get_page(index, get_snapshot_view(snapshot, 'memories_and_worries'),
+                                                      request.args.get('cursor'), limit)
+        except memory_index.InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({
+            'memories_and_worries': page,
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        logger.exception("Error in %s: %s", request.path, e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/trends')
+def trends():
+    try:
+        resolution = request.args.get('resolution', 'day')
+        if resolution not in TRENDS_RESOLUTIONS:
+            return jsonify({"error": f"Unknown resolution {resolution!r}, expected one of {', '.join(TRENDS_RESOLUTIONS)}"}), 400
+        try:
+            end = datetime.strptime(request.args['to'], '%Y-%m-%d').toordinal() if request.args.get('to') else datetime.now().toordinal()
+            start = datetime.strptime(request.args['from'], '%Y-%m-%d').toordinal() if request.args.get('from') else end - TRENDS_DEFAULT_DAYS + 1
+        except ValueError:
+            return jsonify({"error": "from and to must be dates like 2025-06-29"}), 400
+        if start > end:
+            return jsonify({"error": "from must not be after to"}), 400
+        if end - start + 1 > TRENDS_MAX_DAYS:
+            return jsonify({"error": f"At most {TRENDS_MAX_DAYS} days per request"}), 400
+
+        snapshot = get_sheet_snapshot()
+        if not snapshot:
+            return jsonify({"error": "Failed to fetch sheet data"}), 500
+
+        trend_data = get_trends_window(snapshot['processed_data'], start, end, resolution)
+        trend_data['resolution'] = resolution
+        return jsonify(trend_data)
+    except Exception as e:
+        logger.exception("Error in %s: %s", request.path, e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/stats')
+def stats():
+    try:
+        try:
+            window = int(request.args.get('window', 7))
+            # Window end dates default to yesterday, like the weekly email
+            end = datetime.strptime(request.args['end'], '%Y-%m-%d').toordinal() if request.args.get('end') else datetime.now().toordinal() - 1
+            first_end = datetime.strptime(request.args['from'], '%Y-%m-%d').toordinal() if request.args.get('from') else end
+            step = int(request.args.get('step', window))
+        except ValueError:
+            return jsonify({"error": "window and step must be numbers, end and from dates like 2025-06-29"}), 400
+        if window < 1 or step < 1:
+            return jsonify({"error": "window and step must be at least 1"}), 400
+        if first_end > end:
+            return jsonify({"error": "from must not be after end"}), 400
+        if end - first_end + window > TRENDS_MAX_DAYS:
+            return jsonify({"error": f"At most {TRENDS_MAX_DAYS} days per request"}), 400
+
+        snapshot = get_sheet_snapshot()
+        if not snapshot:
+            return jsonify({"error": "Failed to fetch sheet data"}), 500
+
+        # One window ending on end, or one every step days back to from
+        ends = list(range(end, first_end - 1, -step))[::-1]
+        return jsonify({
+            'window': window,
+            'windows': get_window_stats(snapshot['processed_data'], ends, window)
+        })
+    except Exception as e:
+        logger.exception("Error in %s: %s", request.path, e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/test')
 def test():
     return jsonify({
         "message": "API is working!",
-        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "snapshot": get_snapshot_health()
+    })
+
+@app.route('/metrics')
+def metrics():
+    return jsonify({
+        "sheet_cache": get_sheet_cache_stats(),
+        "upstreams": http_client.get_metrics(),
+        "date_parsing": date_parsing.get_cache_stats()
     })
 
 @app.route('/send-email')
@@ -785,21 +1000,20 @@ def trigger_email():
         else:
             return jsonify({"error": "Failed to send email"}), 500
     except Exception as e:
+        logger.exception("Error in %s: %s", request.path, e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/test-email')
 def test_simple_email():
     """Send a simple test email"""
     try:
-        print(f"Using API key: {RESEND_API_KEY[:10] if RESEND_API_KEY else 'None'}...")
-        print(f"From email: {EMAIL_FROM}")
-        print(f"To emails: {EMAIL_TO}")
+        logger.debug("From email: %s, to emails: %s", EMAIL_FROM, EMAIL_TO)
         
         if not RESEND_API_KEY:
             return jsonify({"error": "RESEND_API_KEY not set"}), 500
         
         email_to_list = [email.strip() for email in EMAIL_TO.split(',')]
-        print(f"Sending email to: {email_to_list}")
+        logger.info("Sending test email to %s", email_to_list)
         
         try:
             response = resend.Emails.send({
@@ -815,9 +1029,7 @@ def test_simple_email():
             })
             
         except resend.exceptions.ResendError as e:
-            print(f"Resend API Error: {e}")
-            print(f"Error details: {getattr(e, 'message', 'No message')}")
-            print(f"Error code: {getattr(e, 'code', 'No code')}")
+            logger.error("Resend API Error: %s (details: %s, code: %s)", e, getattr(e, 'message', 'No message'), getattr(e, 'code', 'No code'))
             return jsonify({
                 "error": f"Resend API Error: {e}",
                 "details": getattr(e, 'message', 'No message'),
@@ -825,76 +1037,120 @@ def test_simple_email():
             }), 500
         
     except Exception as e:
-        print(f"General error: {e}")
+        logger.exception("General error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/face-match', methods=['POST'])
 def face_match():
     """Compare uploaded face embeddings with stored reference embeddings"""
     try:
-        from flask import request
-        import numpy as np
-        
-        # Get the face data from the request
-        data = request.get_json()
-        if not data or 'faces' not in data:
-            return jsonify({"error": "No face data provided"}), 400
-        
-        uploaded_faces = data['faces']
-        if not uploaded_faces:
+        # Embeddings come as JSON faces, or packed float32 in the body or base64 in "embeddings"
+        packed = None
+        if request.mimetype == 'application/octet-stream':
+            packed = request.get_data()
+            # Options ride in the query string, values that are not numbers are kept to fail validation
+            data = {name: request.args.get(name, default=request.args[name], type=int)
+                    for name in ('top_k', 'probes') if name in request.args}
+        else:
+            data = request.get_json(silent=True)
+            if not data or ('faces' not in data and 'embeddings' not in data):
+                return jsonify({"error": "No face data provided"}), 400
+            if 'embeddings' in data:
+                try:
+                    packed = base64.b64decode(data['embeddings'], validate=True)
+                except (binascii.Error, TypeError, ValueError):
+                    return jsonify({"error": "embeddings must be base64 packed float32"}), 400
+
+        if packed is not None:
+            try:
+                embeddings = face_gallery.unpack_embeddings(packed)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            # Packed embeddings carry no per-face details
+            uploaded_faces = [{}] * len(embeddings)
+        else:
+            uploaded_faces = data['faces']
+            if isinstance(uploaded_faces, list) and all(isinstance(face, dict) for face in uploaded_faces):
+                embeddings = [face.get('embedding', []) for face in uploaded_faces]
+            else:
+                uploaded_faces = None
+
+        if uploaded_faces is not None and not uploaded_faces:
             return jsonify({"error": "No faces detected in uploaded image"}), 400
-        
-        # For now, let's use a simple reference embedding
-        # You can store this in an environment variable or database
-        reference_embedding = [
-            100.0, 100.0,  # Keypoint 1 (x, y)
-            80.0, 80.0,    # Keypoint 2 (x, y)
-            120.0, 80.0,   # Keypoint 3 (x, y)
-            90.0, 120.0,   # Keypoint 4 (x, y)
-            110.0, 120.0   # Keypoint 5 (x, y)
-        ]
-        
-        best_match = None
+        if uploaded_faces is None or len(uploaded_faces) > face_gallery.FACE_MATCH_MAX_FACES:
+            return jsonify({"error": f"faces must be a list of at most {face_gallery.FACE_MATCH_MAX_FACES} faces"}), 400
+
+        top_k = data.get('top_k', face_gallery.FACE_MATCH_TOP_K)
+        # bool is an int subclass, JSON true is not a count
+        if isinstance(top_k, bool) or not isinstance(top_k, int) or not 1 <= top_k <= face_gallery.FACE_MATCH_MAX_TOP_K:
+            return jsonify({"error": f"top_k must be between 1 and {face_gallery.FACE_MATCH_MAX_TOP_K}"}), 400
+        # Lists searched in large, indexed galleries: more is slower with better recall
+        probes = data.get('probes')
+        if probes is not None and (isinstance(probes, bool) or not isinstance(probes, int) or probes < 1):
+            return jsonify({"error": "probes must be a positive integer"}), 400
+
+        # Every face against every reference in one matrix product
+        try:
+            face_matches = face_gallery.match_faces(face_gallery.get_gallery(), embeddings, top_k, probes)
+        except face_gallery.InvalidEmbeddings as e:
+            return jsonify({"error": str(e)}), 400
+        except (TypeError, ValueError):
+            return jsonify({"error": "Each face needs an embedding list of numbers"}), 400
+
+        results = []
+        best_face = None
         best_similarity = 0.0
-        
-        # Compare each uploaded face with the reference
-        for face in uploaded_faces:
-            embedding = face.get('embedding', [])
-            if len(embedding) >= len(reference_embedding):
-                # Pad or truncate to match reference length
-                embedding = embedding[:len(reference_embedding)]
-                while len(embedding) < len(reference_embedding):
-                    embedding.append(0.0)
-                
-                # Calculate cosine similarity
-                embedding_np = np.array(embedding)
-                reference_np = np.array(reference_embedding)
-                
-                # Normalize vectors
-                embedding_norm = np.linalg.norm(embedding_np)
-                reference_norm = np.linalg.norm(reference_np)
-                
-                if embedding_norm > 0 and reference_norm > 0:
-                    similarity = np.dot(embedding_np, reference_np) / (embedding_norm * reference_norm)
-                    
-                    if similarity > best_similarity:
-                        best_similarity = similarity
-                        best_match = face
-        
-        # Determine if it's a match (threshold can be adjusted)
-        match_threshold = 0.7
+        for face_number, (face, matches) in enumerate(zip(uploaded_faces, face_matches)):
+            results.append({
+                "face": face_number,
+                "confidence": face.get('confidence', 0.0),
+                "matches": [{"id": reference_id, "similarity": similarity} for reference_id, similarity in matches]
+            })
+            if matches and matches[0][1] > best_similarity:
+                best_similarity = matches[0][1]
+                best_face = face
+
+        # Determine if it's a match (threshold can be adjusted with FACE_MATCH_THRESHOLD)
+        match_threshold = face_gallery.FACE_MATCH_THRESHOLD
         is_match = best_similarity >= match_threshold
-        
+
         return jsonify({
             "match": is_match,
             "similarity": best_similarity,
             "message": f"Best similarity: {best_similarity:.3f} (threshold: {match_threshold})",
             "face_count": len(uploaded_faces),
-            "best_face_confidence": best_match['confidence'] if best_match else 0.0
+            "best_face_confidence": best_face.get('confidence', 0.0) if best_face else 0.0,
+            "results": results
         })
-        
+
+    except Exception as e:
+        logger.exception("Error in face matching: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/face-gallery/enroll', methods=['POST'])
+def face_gallery_enroll():
+    """Append reference faces to the gallery /face-match compares against"""
+    try:
+        data = request.get_json(silent=True)
+        if not data or 'faces' not in data:
+            return jsonify({"error": "No face data provided"}), 400
+        if not FACE_ENROLL_TOKEN:
+            return jsonify({"error": "Enrolling faces is disabled, set FACE_ENROLL_TOKEN"}), 403
+        if not hmac.compare_digest(str(data.get('token', '')), FACE_ENROLL_TOKEN):
+            return jsonify({"error": "Wrong token"}), 401
+
+        faces = data['faces']
+        if not isinstance(faces, list) or not faces or not all(isinstance(face, dict) and 'id' in face for face in faces):
+            return jsonify({"error": "faces must be a list of {id, embedding} objects"}), 400
+        try:
+            gallery_size = face_gallery.enroll([face['id'] for face in faces], [face.get('embedding') for face in faces])
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({"enrolled": len(faces), "gallery_size": gallery_size})
+
     except Exception as e:
-        print(f"Error in face matching: {e}")
+        logger.exception("Error enrolling faces: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/gift-verify', methods=['POST'])
@@ -912,7 +1168,7 @@ def gift_verify():
         
         # Set your password here (you can also use environment variable)
         correct_password = os.getenv('GIFT_PASSWORD')
-        print(f"Correct password: {correct_password}")
+        logger.info("Gift unlock attempt %s", "succeeded" if submitted_password == correct_password else "failed")
         if submitted_password == correct_password:
             # Return gift information
             gift_message = os.getenv('GIFT_MESSAGE', 'Error loading the awesome gift message I wrote.')
@@ -932,11 +1188,13 @@ def gift_verify():
                             "title": "",
                             "images": [
                                 {
-                                    "src": "gift-assets/michael-preview.png",
+                                    "src": gift_assets.get_asset_url("michael-preview.png"),
+                                    "srcset": gift_assets.get_asset_srcset("michael-preview.png"),
                                     "alt": "Michael Preview"
                                 },
                                 {
-                                    "src": "gift-assets/amy-preview.png", 
+                                    "src": gift_assets.get_asset_url("amy-preview.png"),
+                                    "srcset": gift_assets.get_asset_srcset("amy-preview.png"),
                                     "alt": "Amy Preview"
                                 }
                             ]
@@ -948,12 +1206,12 @@ def gift_verify():
                             "downloads": [
                                 {
                                     "name": "Download Classic",
-                                    "file": "gift-assets/michael_classic.png",
+                                    "file": gift_assets.get_asset_url("michael_classic.png"),
                                     "filename": "michael_classic.png"
                                 },
                                 {
                                     "name": "Download Slim",
-                                    "file": "gift-assets/michael_slim.png",
+                                    "file": gift_assets.get_asset_url("michael_slim.png"),
                                     "filename": "michael_slim.png"
                                 }
                             ]
@@ -970,17 +1228,19 @@ def gift_verify():
             }), 401
         
     except Exception as e:
-        print(f"Error in gift verification: {e}")
+        logger.exception("Error in gift verification: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/gift-assets/<path:filename>')
 def serve_gift_assets(filename):
     """Serve gift asset files"""
     try:
-        from flask import send_from_directory
-        return send_from_directory('gift-assets', filename)
+        # Only the files hashed at startup are served
+        if gift_assets.get_asset(filename) is None:
+            return jsonify({"error": "File not found"}), 404
+        return gift_assets.send_asset(request, filename)
     except Exception as e:
-        print(f"Error serving gift asset {filename}: {e}")
+        logger.error("Error serving gift asset %s: %s", filename, e)
         return jsonify({"error": "File not found"}), 404
 
 # For Vercel deployment
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark the IVF face index against exact (brute-force) search: recall@k and per-face latency
+
+Usage: python benchmark_face_index.py [references ...]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import face_gallery
+import face_index
+
+DIM = 128
+K = 10
+QUERIES = 300
+PROBES = (1, 4, 8, 16, 32)
+# References per enrolled person, each a noisy copy of that person's face
+FACES_PER_PERSON = 10
+NOISE = 0.5
+
+def make_faces(centers, count, rng):
+    """count normalized embeddings of random people from centers"""
+    people = rng.integers(0, len(centers), count)
+    return face_gallery.normalize_rows(centers[people] + NOISE * rng.standard_normal((count, DIM), dtype=np.float32))
+
+def time_queries(search, queries):
+    """Results and per-face latencies of searching the queries one at a time, like single-face requests"""
+    results = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(search(query[np.newaxis]))
+        latencies.append(time.perf_counter() - started)
+    return np.concatenate(results), np.array(latencies)
+
+def recall(found, expected):
+    """Fraction of the exact top k that the approximate top k found"""
+    return np.mean([len(set(row) & set(expected_row)) / len(expected_row)
+                    for row, expected_row in zip(found.tolist(), expected.tolist())])
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    rng = np.random.default_rng(0)
+    print(f"{'refs':>8} {'search':>10} {f'recall@{K}':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'speedup':>8}")
+    for count in sizes:
+        centers = rng.standard_normal((max(1, count // FACES_PER_PERSON), DIM), dtype=np.float32)
+        matrix = make_faces(centers, count, rng)
+        queries = make_faces(centers, QUERIES, rng)
+
+        exact, exact_latencies = time_queries(lambda query: face_gallery.top_matches(query @ matrix.T, K)[0], queries)
+        exact_p99 = np.percentile(exact_latencies, 99)
+        print(f"{count:>8} {'exact':>10} {1.0:>10.3f} {np.percentile(exact_latencies, 50) * 1000:>9.2f} "
+              f"{exact_p99 * 1000:>9.2f} {1.0:>7.2f}x")
+
+        started = time.perf_counter()
+        index = face_index.build_index(matrix)
+        build_time = time.perf_counter() - started
+        for probes in PROBES:
+            found, latencies = time_queries(lambda query: face_index.search(index, query, K, probes)[0], queries)
+            p99 = np.percentile(latencies, 99)
+            print(f"{count:>8} {f'probes={probes}':>10} {recall(found, exact):>10.3f} {np.percentile(latencies, 50) * 1000:>9.2f} "
+                  f"{p99 * 1000:>9.2f} {exact_p99 / p99:>7.2f}x")
+        print(f"{count:>8} built {len(index['centroids'])} lists in {build_time:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark process_records against the old multi-pass, strptime-based version
+
+Usage: python benchmark_process_records.py [rows ...]
+"""
+
+import contextlib
+import gc
+import io
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import app
+import date_parsing
+import sheet_schema
+
+def legacy_parse_timestamp(ts):
+    """The previous timestamp parser: strptime against each format in turn"""
+    for fmt in ("%m/%d/%Y %H:%M:%S", "%m/%d/%y %H:%M:%S", "%m/%d/%Y", "%m/%d/%y"):
+        try:
+            return datetime.strptime(ts, fmt)
+        except Exception:
+            continue
+    return datetime.min
+
+# The previous date parser is the same code without the LRU cache
+legacy_parse_date = date_parsing.parse_date.__wrapped__
+
+def legacy_sort_records(records):
+    """The previous sort: dates parsed in the sort key and again for the debug print"""
+    sorted_records = sorted(records, key=lambda x: (legacy_parse_date(x.get('What day is this for? ', '')).timestamp(), legacy_parse_timestamp(x.get('Timestamp', '')).timestamp()), reverse=True)
+    print([legacy_parse_date(r.get('What day is this for? ', '')).timestamp() for r in sorted_records])
+    return sorted_records
+
+def legacy_classify_records(sorted_records):
+    """The previous classification: one list comprehension per bucket"""
+    amy_entries = [r for r in sorted_records if r.get('Who is filling this out right now.') == 'Amy']
+    michael_entries = [r for r in sorted_records if r.get('Who is filling this out right now.') == 'Michael']
+    hangout_entries = [r for r in sorted_records if r.get('Did you hang out (in real life)? ') == 'Yes' and r.get('What day is this for? ')]
+    minecraft_entries = [r for r in sorted_records if r.get('Did you hang out (in real life)? ') == 'Yes' and r.get('What day is this for? ') and 'We played Minecraft' in r.get('Check all that are true for this hangout.', '')]
+    kiss_entries = [r for r in sorted_records if r.get('Did you hang out (in real life)? ') == 'Yes' and ('We held hands and kissed' in r.get('Check all that are true for this hangout.', '') or 'kissed' in r.get('Check all that are true for this hangout.', ''))]
+    print(len(kiss_entries), [r['What day is this for? '] for r in kiss_entries])
+    memories_and_worries = []
+    for record in sorted_records:
+        user = record.get('Who is filling this out right now.', '')
+        timestamp = record.get('Timestamp', '')
+        date = record.get('What day is this for? ', '')
+        for note_type, key in (('memory', "What's a good memory from this hangout (or relationship)? "),
+                               ('worry', "What's something you're worried about? "),
+                               ('other', "Anything else to note?")):
+            text = record.get(key, '')
+            if text and text.strip():
+                memories_and_worries.append({'user': user, 'type': note_type, 'text': text, 'timestamp': timestamp, 'date': date})
+    return {
+        'sorted_records': sorted_records,
+        'amy_entries': amy_entries,
+        'michael_entries': michael_entries,
+        'hangout_entries': hangout_entries,
+        'minecraft_entries': minecraft_entries,
+        'kiss_entries': kiss_entries,
+        'memories_and_worries': memories_and_worries
+    }
+
+def legacy_process_records(records):
+    """The previous process_records"""
+    return legacy_classify_records(legacy_sort_records(records))
+
+def make_records(count, seed=0):
+    """Generate form responses shaped like the real sheet, two per day"""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    records = []
+    for i in range(count):
+        day = start + timedelta(days=i // 2)
+        hangout = rng.random() < 0.4
+        activities = [a for a in ('We played Minecraft', ' We held hands and kissed', ' We had a sleepover')
+                      if hangout and rng.random() < 0.5]
+        record = dict.fromkeys(sheet_schema.RECORD_SCHEMA, '')
+        record.update({
+            'Timestamp': (day + timedelta(hours=21, minutes=i % 60)).strftime('%m/%d/%Y %H:%M:%S'),
+            'Who is filling this out right now.': 'Amy' if i % 2 else 'Michael',
+            'What day is this for? ': day.strftime('%m/%d/%Y'),
+            'Did you hang out (in real life)? ': 'Yes' if hangout else 'No',
+            'Check all that are true for this hangout.': ','.join(activities),
+            'How strong do you think our relationship is?': str(rng.randint(1, 5)),
+            'How stressed are you about things outside of our relationship? ': str(rng.randint(1, 5)),
+            "What's a good memory from this hangout (or relationship)? ": 'a good memory' if rng.random() < 0.3 else '',
+            "What's something you're worried about? ": 'a worry' if rng.random() < 0.2 else '',
+            'Anything else to note?': ''
+        })
+        records.append(record)
+    rng.shuffle(records)
+    return records
+
+class LegacyRecord(dict):
+    """The previous record type: a question-keyed dict carrying its parsed dates"""
+    __slots__ = ('day', 'timestamp')
+
+def to_legacy_records(records):
+    """Copy dict records into the previous record type"""
+    legacy_records = []
+    for record in records:
+        legacy_record = LegacyRecord(record)
+        legacy_record.day = date_parsing.parse_date(record['What day is this for? '])
+        legacy_record.timestamp = date_parsing.parse_timestamp(record['Timestamp'])
+        legacy_records.append(legacy_record)
+    return legacy_records
+
+def to_sheet_records(records):
+    """Read dict records the way process_sheet_data reads sheet rows"""
+    headers = list(records[0])
+    read_record = sheet_schema.make_record_reader(headers)
+    return [read_record([record[header] for header in headers]) for record in records]
+
+def as_dicts(result):
+    """Turn the SheetRecords in a process_records result back into question-keyed dicts"""
+    return {key: [r.to_dict() for r in value] if key.endswith(('_records', '_entries')) else value
+            for key, value in result.items()}
+
+def allocated_bytes(func, records):
+    """Bytes still allocated after building func(records)"""
+    date_parsing.parse_date.cache_clear()
+    date_parsing.parse_timestamp.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func(records)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+def best_of(func, records, repeat):
+    """Best wall time over a few runs, with the debug prints swallowed and GC paused like timeit does"""
+    best = float('inf')
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            gc.collect()
+            gc.disable()
+            try:
+                started = time.perf_counter()
+                result = func(records)
+                best = min(best, time.perf_counter() - started)
+            finally:
+                gc.enable()
+    return best, result
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    print(f"{'rows':>8} {'stage':>9} {'legacy (ms)':>12} {'new (ms)':>9} {'speedup':>8}")
+    for count in sizes:
+        records = make_records(count)
+        sheet_records = to_sheet_records(records)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sorted_records = legacy_sort_records(records)
+        # Same sorted order, as SheetRecords
+        by_id = {id(record): sheet_record for record, sheet_record in zip(records, sheet_records)}
+        sorted_sheet_records = [by_id[id(record)] for record in sorted_records]
+        repeat = 5 if count <= 10_000 else 3
+        stages = [
+            ('classify', legacy_classify_records, app.classify_records, sorted_records, sorted_sheet_records),
+            ('total', legacy_process_records, app.process_records, records, sheet_records)
+        ]
+        for stage, legacy_func, new_func, legacy_data, new_data in stages:
+            legacy_time, legacy = best_of(legacy_func, legacy_data, repeat)
+            new_time, new = best_of(new_func, new_data, repeat)
+            # The new version also returns the record store and day index
+            new = as_dicts(new)
+            assert legacy == {key: new[key] for key in legacy}, f"{stage} output differs from the legacy output"
+            print(f"{count:>8} {stage:>9} {legacy_time * 1000:>12.1f} {new_time * 1000:>9.1f} {legacy_time / new_time:>7.2f}x")
+
+        # Records themselves: question-keyed dicts vs SheetRecords
+        legacy_size = allocated_bytes(to_legacy_records, records)
+        new_size = allocated_bytes(to_sheet_records, records)
+        print(f"{count:>8} {'memory':>9} {legacy_size / 1e6:>10.1f}MB {new_size / 1e6:>7.1f}MB {legacy_size / new_size:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
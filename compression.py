@@ -0,0 +1,71 @@
+"""
+Content-Encoding negotiation for the JSON API.
+
+The fixed snapshot bodies are compressed once per snapshot by the refresher,
+at the slowest settings, and the variants are kept next to the plain body.
+Bodies made on a request, like /hangout-data?fields= selections, are memoized
+the same way but compressed at the cheap per-request levels. Any other JSON
+response over the size threshold is gzipped on the way out. Brotli is used when the optional
+brotli package is installed, gzip otherwise.
+
+Environment:
+    COMPRESS_MIN_SIZE       bodies smaller than this many bytes are sent uncompressed (1024)
+"""
+
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+
+# Snapshot variants are compressed once in the background, so they get the slowest, smallest settings
+SNAPSHOT_LEVELS = {'br': 11, 'gzip': 9}
+# Per-response compression is on the request path, keep it cheap
+RESPONSE_GZIP_LEVEL = 5
+RESPONSE_LEVELS = {'br': 4, 'gzip': RESPONSE_GZIP_LEVEL}
+
+# In order of preference when the client accepts several equally
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+def compress(body, encoding, level):
+    """Compress body with the given Content-Encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    # mtime=0 keeps the output, and so the ETag, the same for the same body
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+def compress_variants(body, levels=SNAPSHOT_LEVELS):
+    """Every supported encoding of body at the given levels, empty if it is under COMPRESS_MIN_SIZE"""
+    if len(body) < COMPRESS_MIN_SIZE:
+        return {}
+    variants = {}
+    for encoding in ENCODINGS:
+        compressed = compress(body, encoding, levels[encoding])
+        # Not worth it if it does not shrink
+        if len(compressed) < len(body):
+            variants[encoding] = compressed
+    return variants
+
+def negotiate(request, available=ENCODINGS):
+    """The best encoding in available that the request's Accept-Encoding allows, None for identity"""
+    if not available:
+        return None
+    return request.accept_encodings.best_match([encoding for encoding in ENCODINGS if encoding in available])
+
+def compress_response(request, response):
+    """Gzip a JSON response on the fly if the client accepts it and it is worth it"""
+    if (response.direct_passthrough or response.status_code != 200 or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers or 'ETag' in response.headers):
+        # Snapshot bodies carry their own pre-compressed variants and ETags
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE or negotiate(request, ('gzip',)) != 'gzip':
+        return response
+    response.set_data(compress(body, 'gzip', RESPONSE_GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
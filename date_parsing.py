@@ -0,0 +1,94 @@
+"""
+Date and timestamp parsing for sheet records.
+
+The form only ever produces a handful of shapes ('6/29/25', '6/29/2025',
+'6/30/2025 9:58:01'), so the common ones are recognised with a regex and built
+directly, with strptime kept as the fallback. Results are memoized on the raw
+string because the same dates repeat across records and requests.
+"""
+
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+
+# Number of distinct raw strings kept per parser
+DATE_PARSE_CACHE_SIZE = int(os.getenv('DATE_PARSE_CACHE_SIZE', '8192'))
+
+TIMESTAMP_FORMATS = ("%m/%d/%Y %H:%M:%S", "%m/%d/%y %H:%M:%S", "%m/%d/%Y", "%m/%d/%y")
+
+# M/D/YY or M/D/YYYY, optionally followed by H:M:S
+_TIMESTAMP_SHAPE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})(?: (\d{1,2}):(\d{1,2}):(\d{1,2}))?')
+
+def _expand_two_digit_year(year):
+    # Same pivot strptime uses for %y
+    return year + (2000 if year < 69 else 1900)
+
+def _parse_timestamp_shape(ts):
+    """Build the datetime straight from the string's shape, None if it does not fit"""
+    match = _TIMESTAMP_SHAPE.fullmatch(ts)
+    if not match:
+        return None
+    month, day, year_str, hour, minute, second = match.groups()
+    year = int(year_str)
+    if len(year_str) == 2:
+        year = _expand_two_digit_year(year)
+    try:
+        if hour is None:
+            return datetime(year, int(month), int(day))
+        return datetime(year, int(month), int(day), int(hour), int(minute), int(second))
+    except ValueError:
+        return None
+
+@lru_cache(maxsize=DATE_PARSE_CACHE_SIZE)
+def parse_timestamp(ts):
+    """Parse a form timestamp, datetime.min for broken/missing values"""
+    if isinstance(ts, str):
+        parsed = _parse_timestamp_shape(ts)
+        if parsed is not None:
+            return parsed
+
+    # Try to parse common formats, fallback to string for broken/missing values
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(ts, fmt)
+        except Exception:
+            continue
+    return datetime.min  # Put unparseable/missing dates at the end
+
+@lru_cache(maxsize=DATE_PARSE_CACHE_SIZE)
+def parse_date(date_str):
+    """Parse date strings like '6/29/25' or '6/29/2025'"""
+    if not date_str:
+        return datetime.min
+
+    try:
+        # Handle different date formats
+        if '/' in date_str:
+            parts = date_str.split('/')
+            month = int(parts[0])
+            day = int(parts[1])
+            year = int(parts[2])
+
+            # Handle 2-digit years
+            if year < 100:
+                year += 2000
+
+            return datetime(year, month, day)
+        else:
+            return datetime.min
+    except Exception:
+        return datetime.min
+
+def get_cache_stats():
+    """Get LRU hit/miss counters for both parsers"""
+    stats = {}
+    for name, func in (('parse_timestamp', parse_timestamp), ('parse_date', parse_date)):
+        info = func.cache_info()
+        stats[name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'max_size': info.maxsize
+        }
+    return stats
@@ -0,0 +1,241 @@
+"""
+Reference face embeddings and batched cosine matching for /face-match.
+
+A gallery keeps its reference embeddings L2-normalized once, as one float32
+(references x dimension) matrix with an id per row. Uploaded faces are stacked
+into one matrix and normalized the same way, so the similarities of every face
+to every reference are a single matrix product, and the top-k references per
+face come from one argpartition over it.
+
+Enrolled references live on disk as a float32 .npy matrix of already
+normalized rows plus a JSON sidecar with one id per row. The matrix is
+memory-mapped read-only, so every worker on the host shares the same pages,
+and get_gallery() maps it again when the file's mtime changes. Enrolling
+writes a new file and renames it over the old one, so a reader never sees
+a half-written matrix. Without a gallery file the built-in reference is used.
+Large galleries also get an approximate (IVF) index, see face_index.
+
+Uploads can skip JSON number parsing by sending packed embeddings: a face
+count and dimension as little-endian uint32, then count x dimension
+little-endian float32 values, read straight into a matrix.
+
+Environment:
+    FACE_MATCH_THRESHOLD    similarity the best face needs to count as a match (0.7)
+    FACE_MATCH_TOP_K        matches returned per face unless the request asks for top_k (3)
+    FACE_MATCH_MAX_FACES    most faces accepted in one request (256)
+    FACE_GALLERY_PATH       .npy file of enrolled reference embeddings (face_gallery.npy),
+                            ids in the sidecar next to it (face_gallery.ids.json)
+"""
+
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import face_index
+
+FACE_MATCH_THRESHOLD = float(os.getenv('FACE_MATCH_THRESHOLD', '0.7'))
+FACE_MATCH_TOP_K = int(os.getenv('FACE_MATCH_TOP_K', '3'))
+FACE_MATCH_MAX_FACES = int(os.getenv('FACE_MATCH_MAX_FACES', '256'))
+FACE_MATCH_MAX_TOP_K = 100
+FACE_GALLERY_PATH = os.getenv('FACE_GALLERY_PATH', 'face_gallery.npy')
+
+# Five keypoints (x, y) the uploads are compared with until real references are enrolled
+DEFAULT_REFERENCE = [
+    100.0, 100.0,  # Keypoint 1 (x, y)
+    80.0, 80.0,    # Keypoint 2 (x, y)
+    120.0, 80.0,   # Keypoint 3 (x, y)
+    90.0, 120.0,   # Keypoint 4 (x, y)
+    110.0, 120.0   # Keypoint 5 (x, y)
+]
+
+# Face count and dimension in front of packed embeddings
+PACKED_HEADER = struct.Struct('<II')
+
+logger = logging.getLogger('face_gallery')
+
+class InvalidEmbeddings(ValueError):
+    """Raised for uploaded embeddings with NaN or infinite values"""
+
+# The gallery get_gallery() hands out and the (inode, mtime, size) of the file it was mapped from
+_gallery_cache = {'gallery': None, 'stamp': None}
+_gallery_lock = threading.Lock()
+
+def normalize_rows(matrix):
+    """Scale the rows of a float matrix to unit length in place, all-zero rows stay zero"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+def new_gallery(ids, embeddings):
+    """Gallery of reference embeddings: their ids and normalized float32 matrix"""
+    matrix = normalize_rows(np.array(embeddings, dtype=np.float32, ndmin=2))
+    return {'ids': list(ids), 'matrix': matrix, 'dim': matrix.shape[1]}
+
+def stack_embeddings(embeddings, dim):
+    """(faces x dim) float32 matrix of uploaded embeddings, truncated to dim
+
+    Embeddings shorter than dim cannot be compared and are left as zero rows.
+    Raises InvalidEmbeddings for NaN or infinite values.
+    """
+    try:
+        matrix = np.array(embeddings, dtype=np.float32)
+    except ValueError:
+        # Ragged lengths
+        matrix = None
+    if matrix is not None and matrix.ndim == 2:
+        if matrix.shape[1] >= dim:
+            matrix = np.ascontiguousarray(matrix[:, :dim])
+        else:
+            matrix = np.zeros((len(embeddings), dim), dtype=np.float32)
+    else:
+        matrix = np.zeros((len(embeddings), dim), dtype=np.float32)
+        for row, embedding in enumerate(embeddings):
+            if len(embedding) >= dim:
+                matrix[row] = embedding[:dim]
+
+    # JSON allows NaN and Infinity (and float32 overflows to it), they would make NaN similarities
+    if not np.isfinite(matrix).all():
+        raise InvalidEmbeddings("Embeddings contain NaN or infinite values")
+    return matrix
+
+def unpack_embeddings(packed):
+    """(faces x dimension) float32 matrix over a packed embeddings buffer, without copying it"""
+    if len(packed) < PACKED_HEADER.size:
+        raise ValueError("Packed embeddings need a face count and dimension header")
+    count, dim = PACKED_HEADER.unpack_from(packed)
+    if len(packed) != PACKED_HEADER.size + 4 * count * dim:
+        raise ValueError(f"Header says {count} faces of {dim} values, the body has {len(packed) - PACKED_HEADER.size} bytes of them")
+    matrix = np.frombuffer(packed, dtype='<f4', offset=PACKED_HEADER.size, count=count * dim).reshape(count, dim)
+    if not np.isfinite(matrix).all():
+        raise ValueError("Packed embeddings contain NaN or infinite values")
+    return matrix
+
+def top_matches(scores, k):
+    """Column indexes and scores of the k highest scores in each row, best first"""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        columns = np.broadcast_to(np.arange(k), (scores.shape[0], k))
+    top_scores = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+def match_faces(gallery, embeddings, k=FACE_MATCH_TOP_K, probes=None):
+    """The k most similar references for each embedding, as (id, cosine similarity) lists, best first
+
+    Galleries with an index are searched approximately over probes lists,
+    others exactly. Faces that cannot be compared (too short or all zeros)
+    get an empty list.
+    """
+    queries = normalize_rows(stack_embeddings(embeddings, gallery['dim']))
+    comparable = queries.any(axis=1).tolist()
+    if gallery.get('index') is not None:
+        columns, scores = face_index.search(gallery['index'], queries, k, probes)
+    else:
+        columns, scores = top_matches(queries @ gallery['matrix'].T, k)
+
+    ids = gallery['ids']
+    return [
+        # Index searches mark missing candidates with -1
+        [(ids[column], score) for column, score in zip(face_columns, face_scores) if column >= 0] if face_comparable else []
+        for face_columns, face_scores, face_comparable in zip(columns.tolist(), scores.tolist(), comparable)
+    ]
+
+def get_ids_path(path):
+    """The id sidecar of a gallery file"""
+    return os.path.splitext(path)[0] + '.ids.json'
+
+def get_default_gallery():
+    """The built-in reference, used until a face is enrolled"""
+    return new_gallery(['reference'], [DEFAULT_REFERENCE])
+
+def load_gallery(path=None, index=True):
+    """Memory-map a gallery file and read its ids, indexing it if it is large (and index is set)"""
+    path = path or FACE_GALLERY_PATH
+    matrix = np.load(path, mmap_mode='r')
+    with open(get_ids_path(path)) as ids_file:
+        ids = json.load(ids_file)
+    if matrix.dtype != np.float32 or matrix.ndim != 2 or matrix.shape[0] != len(ids):
+        raise ValueError(f"{path} holds {matrix.shape} {matrix.dtype} embeddings for {len(ids)} ids")
+    gallery = {'ids': ids, 'matrix': matrix, 'dim': matrix.shape[1]}
+    if index and face_index.should_index(len(ids)):
+        started = time.perf_counter()
+        gallery['index'] = face_index.build_index(matrix)
+        logger.info("Indexed %d reference faces into %d lists in %.2fs",
+                    len(ids), len(gallery['index']['centroids']), time.perf_counter() - started)
+    return gallery
+
+def _get_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+def get_gallery():
+    """The current gallery, mapped again if FACE_GALLERY_PATH changed since it was last loaded"""
+    stamp = _get_stamp(FACE_GALLERY_PATH)
+    if _gallery_cache['gallery'] is not None and stamp == _gallery_cache['stamp']:
+        return _gallery_cache['gallery']
+    with _gallery_lock:
+        if _gallery_cache['gallery'] is not None and stamp == _gallery_cache['stamp']:
+            return _gallery_cache['gallery']
+        if stamp is None:
+            gallery = get_default_gallery()
+        else:
+            try:
+                gallery = load_gallery(FACE_GALLERY_PATH)
+            except (OSError, ValueError) as e:
+                # Caught between the sidecar and matrix renames of an enroll, keep the old one and retry next call
+                logger.warning("Could not load face gallery %s: %s", FACE_GALLERY_PATH, e)
+                return _gallery_cache['gallery'] or get_default_gallery()
+            logger.info("Loaded %d reference faces from %s", len(gallery['ids']), FACE_GALLERY_PATH)
+        _gallery_cache['gallery'], _gallery_cache['stamp'] = gallery, stamp
+        return gallery
+
+def _replace_file(path, write):
+    """Write a file next to path and rename it over path"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            write(temp_file)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def enroll(ids, embeddings, path=None):
+    """Append reference embeddings (normalized) and their ids to a gallery file, returns the new size
+
+    Every embedding must have the dimension of the faces already enrolled.
+    """
+    path = path or FACE_GALLERY_PATH
+    ids = [str(face_id) for face_id in ids]
+    new_rows = np.array(embeddings, dtype=np.float32, ndmin=2)
+    # A missing embedding comes out as NaN, an all-zero one can never match
+    if (new_rows.ndim != 2 or new_rows.shape[0] != len(ids) or not new_rows.shape[1]
+            or not np.isfinite(new_rows).all() or not new_rows.any(axis=1).all()):
+        raise ValueError("Need one non-zero embedding of numbers per id")
+    normalize_rows(new_rows)
+
+    with _gallery_lock:
+        if os.path.exists(path):
+            existing = load_gallery(path, index=False)
+            if existing['dim'] != new_rows.shape[1]:
+                raise ValueError(f"Embeddings have {new_rows.shape[1]} values, the gallery has {existing['dim']}")
+            ids = existing['ids'] + ids
+            new_rows = np.concatenate([existing['matrix'], new_rows])
+        # Sidecar first, readers reload on the matrix changing; one starting in between sees
+        # the old matrix with the new ids and retries until both are in place
+        _replace_file(get_ids_path(path), lambda ids_file: ids_file.write(json.dumps(ids).encode()))
+        _replace_file(path, lambda matrix_file: np.save(matrix_file, new_rows))
+    logger.info("Enrolled %d reference faces in %s", len(ids), path)
+    return len(ids)
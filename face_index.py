@@ -0,0 +1,106 @@
+"""
+Inverted-file (IVF) index for approximate face matching over large galleries.
+
+The normalized reference rows are partitioned into lists by spherical k-means
+and each list's rows are stored next to each other. A face is only scored
+against the rows of the `probes` lists whose centroids are most similar to it,
+so with about sqrt(references) lists a search touches a small fraction of the
+gallery. More probes means better recall and slower searches, probing every
+list is exact search. The reordered copy of the rows lives in each worker's
+memory, the memory-mapped gallery itself stays shared.
+
+Environment:
+    FACE_ANN_MIN_SIZE   galleries with fewer references are searched exactly, 0 never builds an index (20000)
+    FACE_ANN_PROBES     lists searched per face unless the request asks for probes (8)
+    FACE_ANN_LISTS      number of lists, 0 for about sqrt(references) (0)
+"""
+
+import os
+
+import numpy as np
+
+FACE_ANN_MIN_SIZE = int(os.getenv('FACE_ANN_MIN_SIZE', '20000'))
+FACE_ANN_PROBES = int(os.getenv('FACE_ANN_PROBES', '8'))
+FACE_ANN_LISTS = int(os.getenv('FACE_ANN_LISTS', '0'))
+
+# k-means is trained on a sample of this many rows per list
+TRAIN_ROWS_PER_LIST = 64
+TRAIN_ITERATIONS = 10
+# Rows scored against the centroids at a time when assigning, bounds the scores matrix
+ASSIGN_CHUNK_ROWS = 16384
+
+def should_index(count):
+    """Whether a gallery of count references gets an index instead of exact search"""
+    return FACE_ANN_MIN_SIZE > 0 and count >= FACE_ANN_MIN_SIZE
+
+def assign(matrix, centroids):
+    """Index of the most similar centroid for every row"""
+    assignment = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), ASSIGN_CHUNK_ROWS):
+        chunk = np.asarray(matrix[start:start + ASSIGN_CHUNK_ROWS])
+        assignment[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignment
+
+def train_centroids(matrix, n_lists, iterations=TRAIN_ITERATIONS, seed=0):
+    """Unit-length spherical k-means centroids of a sample of the (normalized) rows"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(matrix), n_lists * TRAIN_ROWS_PER_LIST)
+    sample = np.asarray(matrix[np.sort(rng.choice(len(matrix), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)]
+    for _ in range(iterations):
+        assignment = assign(sample, centroids)
+        counts = np.bincount(assignment, minlength=n_lists)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        # Sum each list's rows in one pass over the sample sorted by list, empty lists keep their centroid
+        sums = centroids.copy()
+        sums[filled] = np.add.reduceat(sample[np.argsort(assignment, kind='stable')], starts[filled], axis=0)
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+def build_index(matrix, n_lists=None):
+    """IVF index over the rows of a normalized float32 matrix"""
+    count = len(matrix)
+    n_lists = min(n_lists or FACE_ANN_LISTS or max(1, round(count ** 0.5)), count)
+    centroids = train_centroids(matrix, n_lists)
+    assignment = assign(matrix, centroids)
+
+    rows = np.argsort(assignment, kind='stable')
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+    return {
+        'centroids': centroids,
+        'rows': rows,                                    # gallery row of each stored vector
+        'offsets': offsets,                              # list i is vectors[offsets[i]:offsets[i + 1]]
+        'vectors': np.ascontiguousarray(matrix[rows])
+    }
+
+def search(index, queries, k, probes=None):
+    """Gallery rows and scores of the approximate top k for each normalized query, best first
+
+    Rows are -1 (scores -inf) past the candidates found when the probed
+    lists hold fewer than k references.
+    """
+    centroids, offsets, vectors, rows = index['centroids'], index['offsets'], index['vectors'], index['rows']
+    probes = min(probes or FACE_ANN_PROBES, len(centroids))
+    columns = np.full((len(queries), k), -1, dtype=np.int64)
+    scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+
+    # The lists to probe for every face in one product against the centroids
+    centroid_scores = queries @ centroids.T
+    if probes < len(centroids):
+        probed = np.argpartition(-centroid_scores, probes - 1, axis=1)[:, :probes]
+    else:
+        probed = np.broadcast_to(np.arange(len(centroids)), (len(queries), len(centroids)))
+
+    for face, lists in enumerate(probed):
+        candidates = np.concatenate([np.arange(offsets[i], offsets[i + 1]) for i in lists])
+        if not len(candidates):
+            continue
+        candidate_scores = vectors[candidates] @ queries[face]
+        top = min(k, len(candidates))
+        best = np.argpartition(-candidate_scores, top - 1)[:top] if top < len(candidates) else np.arange(top)
+        best = best[np.argsort(-candidate_scores[best], kind='stable')]
+        columns[face, :top] = rows[candidates[best]]
+        scores[face, :top] = candidate_scores[best]
+    return columns, scores
@@ -0,0 +1,204 @@
+"""
+Content-hashed serving of the files in gift-assets/.
+
+Every asset is hashed once at startup. The hash is its strong ETag and, as
+?v=<hash prefix>, its fingerprint: a fingerprinted URL always names the same
+bytes, so it is cached as immutable for a year, while the bare URL is
+revalidated with the ETag. Responses honour Range and If-Range, so an
+interrupted download resumes where it stopped.
+
+Images over GIFT_VARIANT_MIN_SIZE also come in derived variants when the
+optional Pillow package is installed: ?w= picks the smallest configured width
+at least that wide, and an Accept header that names image/avif or image/webp
+gets that format. A variant is encoded on first use and kept on disk under the
+source hash, so each one is made once and stays valid until the source changes.
+Smaller files, like the skin downloads, are always sent byte for byte.
+
+Environment:
+    GIFT_ASSETS_DIR         directory the assets are served from (gift-assets next to this file)
+    GIFT_VARIANTS_DIR       where derived variants are cached (gift-asset-variants in the temp directory)
+    GIFT_VARIANT_WIDTHS     widths ?w= snaps up to (200,400,800)
+    GIFT_VARIANT_MIN_SIZE   images smaller than this many bytes get no variants (32768)
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+from functools import lru_cache
+
+from flask import send_file
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+GIFT_ASSETS_DIR = os.getenv('GIFT_ASSETS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gift-assets'))
+
+GIFT_VARIANTS_DIR = os.getenv('GIFT_VARIANTS_DIR', os.path.join(tempfile.gettempdir(), 'gift-asset-variants'))
+GIFT_VARIANT_WIDTHS = sorted(int(width) for width in os.getenv('GIFT_VARIANT_WIDTHS', '200,400,800').split(','))
+GIFT_VARIANT_MIN_SIZE = int(os.getenv('GIFT_VARIANT_MIN_SIZE', '32768'))
+
+# Cache-Control max-age of fingerprinted URLs
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+FINGERPRINT_LENGTH = 12
+
+# Image types variants are made from, and the formats they can be converted to, in order of preference
+VARIANT_SOURCES = ('image/png', 'image/jpeg')
+VARIANT_FORMATS = {
+    'avif': {'mimetype': 'image/avif', 'pillow': 'AVIF', 'options': {'quality': 60}},
+    'webp': {'mimetype': 'image/webp', 'pillow': 'WEBP', 'options': {'quality': 80, 'method': 6}}
+}
+
+logger = logging.getLogger('gift_assets')
+
+# filename -> {'path', 'etag', 'version', 'size', 'mimetype', 'width'}, filled by load_assets()
+_assets = {}
+# One encoder at a time, so a variant requested twice at once is still made once
+_variant_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def get_variant_formats():
+    """The VARIANT_FORMATS this Pillow build can write"""
+    if Image is None:
+        return ()
+    Image.init()
+    return tuple(name for name, variant_format in VARIANT_FORMATS.items() if variant_format['pillow'] in Image.SAVE)
+
+def hash_file(path):
+    """sha256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as asset_file:
+        for chunk in iter(lambda: asset_file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def scan_assets(directory=None):
+    """Hash every file under directory, keyed by its path relative to it"""
+    directory = directory or GIFT_ASSETS_DIR
+    assets = {}
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, directory).replace(os.sep, '/')
+            digest = hash_file(path)
+            asset = assets[name] = {
+                'path': path,
+                'etag': digest[:32],
+                'version': digest[:FINGERPRINT_LENGTH],
+                'size': os.path.getsize(path),
+                'mimetype': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                'width': None   # set for images that get variants
+            }
+            if Image is not None and asset['mimetype'] in VARIANT_SOURCES and asset['size'] >= GIFT_VARIANT_MIN_SIZE:
+                try:
+                    # Only reads the header
+                    with Image.open(path) as image:
+                        asset['width'] = image.width
+                except OSError as e:
+                    logger.warning("Not making variants of %s: %s", name, e)
+    return assets
+
+def load_assets(directory=None):
+    """Hash the assets once, at startup"""
+    _assets.clear()
+    if os.path.isdir(directory or GIFT_ASSETS_DIR):
+        _assets.update(scan_assets(directory))
+    return _assets
+
+def get_asset(filename):
+    """The hashed asset named filename, None if there is no such asset"""
+    return _assets.get(filename)
+
+def get_asset_url(filename, width=None):
+    """Fingerprinted URL of an asset, relative like the links in gift.html"""
+    asset = get_asset(filename)
+    url = f"gift-assets/{filename}"
+    if not asset:
+        return url
+    url = f"{url}?v={asset['version']}"
+    return f"{url}&w={width}" if width else url
+
+def get_asset_srcset(filename):
+    """srcset of an image's variant widths (and its own), empty if it has no variants"""
+    asset = get_asset(filename)
+    if not asset or not asset['width']:
+        return ''
+    widths = [width for width in GIFT_VARIANT_WIDTHS if width < asset['width']]
+    candidates = [f"{get_asset_url(filename, width)} {width}w" for width in widths]
+    candidates.append(f"{get_asset_url(filename)} {asset['width']}w")
+    return ', '.join(candidates)
+
+def get_variant_width(asset, requested):
+    """The configured width a ?w= snaps up to, None for the full size"""
+    if not requested or requested <= 0:
+        return None
+    width = next((width for width in GIFT_VARIANT_WIDTHS if width >= requested), None)
+    return width if width and width < asset['width'] else None
+
+def negotiate_format(request):
+    """The most preferred variant format the Accept header names explicitly, None to keep the original"""
+    # Only explicit image types count, a */* client may not decode them
+    accepted = {value for value, quality in request.accept_mimetypes if quality > 0}
+    return next((name for name in get_variant_formats() if VARIANT_FORMATS[name]['mimetype'] in accepted), None)
+
+def get_variant(asset, width, variant_format):
+    """Path of an asset resized to width in variant_format, encoded on first use and cached by source hash"""
+    extension = variant_format or os.path.splitext(asset['path'])[1].lstrip('.')
+    path = os.path.join(GIFT_VARIANTS_DIR, f"{asset['etag']}-{width or 'full'}.{extension}")
+    if os.path.exists(path):
+        return path
+    with _variant_lock:
+        if os.path.exists(path):
+            return path
+        os.makedirs(GIFT_VARIANTS_DIR, exist_ok=True)
+        with Image.open(asset['path']) as image:
+            source_format = image.format
+            if width:
+                image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            fd, temp_path = tempfile.mkstemp(dir=GIFT_VARIANTS_DIR, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as variant_file:
+                    if variant_format:
+                        image.save(variant_file, VARIANT_FORMATS[variant_format]['pillow'],
+                                   **VARIANT_FORMATS[variant_format]['options'])
+                    else:
+                        image.save(variant_file, source_format)
+                # Renamed into place so a concurrent worker never serves half a file
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+    logger.info("Made %s variant of %s, %s", extension, asset['path'], f"{width}px wide" if width else 'full size')
+    return path
+
+def send_asset(request, filename):
+    """Response for an asset (or its variant) with its ETag, Range support and long-lived caching for fingerprinted URLs"""
+    asset = get_asset(filename)
+    path, mimetype, etag = asset['path'], asset['mimetype'], asset['etag']
+    if asset['width']:
+        width = get_variant_width(asset, request.args.get('w', type=int))
+        variant_format = negotiate_format(request)
+        if width or variant_format:
+            try:
+                path = get_variant(asset, width, variant_format)
+                if variant_format:
+                    mimetype = VARIANT_FORMATS[variant_format]['mimetype']
+                etag = f"{etag}-{width or 'full'}-{variant_format or 'original'}"
+            except OSError as e:
+                logger.warning("Could not make a variant of %s, sending the original: %s", filename, e)
+
+    # Unversioned (or stale) URLs may change and get no-cache, i.e. revalidate with the ETag
+    fingerprinted = request.args.get('v') == asset['version']
+    # send_file answers If-None-Match with a 304 and Range / If-Range with a 206
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True,
+                         max_age=IMMUTABLE_MAX_AGE if fingerprinted else None)
+    if fingerprinted:
+        response.cache_control.immutable = True
+    if asset['width']:
+        # Which format was sent depends on the Accept header
+        response.vary.add('Accept')
+    return response
@@ -0,0 +1,144 @@
+"""
+Shared HTTP client for every outbound call the API makes (Google Sheets, Resend).
+
+All requests go through one pooled requests.Session with connect/read timeouts,
+a bounded number of retries with jittered exponential backoff, and per-upstream
+latency counters that the /metrics endpoint exposes.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Timeouts are in seconds, retries are on top of the first attempt
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.25'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '4'))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+
+# Status codes worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+logger = logging.getLogger('http_client')
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+_session.mount('https://', _adapter)
+_session.mount('http://', _adapter)
+
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+def _record(upstream, elapsed_ms, error=False, retry=False):
+    """Add one attempt to the latency counters for an upstream"""
+    with _metrics_lock:
+        metrics = _metrics.get(upstream)
+        if metrics is None:
+            metrics = _metrics[upstream] = {
+                'requests': 0,
+                'errors': 0,
+                'retries': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'recent_ms': deque(maxlen=256)
+            }
+        metrics['requests'] += 1
+        metrics['total_ms'] += elapsed_ms
+        metrics['max_ms'] = max(metrics['max_ms'], elapsed_ms)
+        metrics['recent_ms'].append(elapsed_ms)
+        if error:
+            metrics['errors'] += 1
+        if retry:
+            metrics['retries'] += 1
+
+def _backoff(attempt):
+    """Full-jitter exponential backoff delay before the given retry attempt"""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** (attempt - 1))))
+
+def request(upstream, method, url, timeout=None, retries=None, **kwargs):
+    """Send a request through the shared session with timeouts and bounded retries"""
+    method = method.upper()
+    timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    retries = HTTP_MAX_RETRIES if retries is None else retries
+    idempotent = method in IDEMPOTENT_METHODS
+
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            response = _session.request(method, url, timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            # Only retry a non-idempotent call if it never reached the server
+            retryable = isinstance(e, (requests.ConnectionError, requests.Timeout)) and (
+                idempotent or isinstance(e, requests.ConnectTimeout))
+            will_retry = retryable and attempt < retries
+            _record(upstream, elapsed_ms, error=True, retry=will_retry)
+            if not will_retry:
+                logger.warning("%s %s to %s failed after %d attempt(s): %s", method, url, upstream, attempt + 1, e)
+                raise
+            logger.info("%s %s to %s failed, retrying: %s", method, url, upstream, e)
+        else:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            retryable = response.status_code in RETRY_STATUSES and (idempotent or response.status_code == 429)
+            will_retry = retryable and attempt < retries
+            _record(upstream, elapsed_ms, error=response.status_code >= 500, retry=will_retry)
+            if not will_retry:
+                return response
+            logger.info("%s %s to %s returned %d, retrying", method, url, upstream, response.status_code)
+
+        attempt += 1
+        time.sleep(_backoff(attempt))
+
+def get(upstream, url, **kwargs):
+    """GET through the shared session"""
+    return request(upstream, 'GET', url, **kwargs)
+
+def post(upstream, url, **kwargs):
+    """POST through the shared session"""
+    return request(upstream, 'POST', url, **kwargs)
+
+def get_metrics():
+    """Get request counts and latency percentiles for each upstream"""
+    with _metrics_lock:
+        result = {}
+        for upstream, metrics in _metrics.items():
+            recent = sorted(metrics['recent_ms'])
+            result[upstream] = {
+                'requests': metrics['requests'],
+                'errors': metrics['errors'],
+                'retries': metrics['retries'],
+                'avg_ms': round(metrics['total_ms'] / metrics['requests'], 2),
+                'max_ms': round(metrics['max_ms'], 2),
+                'p50_ms': round(recent[len(recent) // 2], 2) if recent else None,
+                'p95_ms': round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2) if recent else None
+            }
+        return result
+
+def make_resend_client():
+    """Build a Resend SDK HTTP client backed by the shared session, or None if the SDK is too old to accept one"""
+    try:
+        from resend.http_client import HTTPClient
+    except ImportError:
+        return None
+
+    class SessionClient(HTTPClient):
+        def request(self, method, url, headers, json=None, files=None, data=None):
+            try:
+                response = request('resend', method, url, headers=headers, files=files, data=data,
+                                   json=json if data is None else None)
+            except requests.RequestException as e:
+                # The SDK turns this into a ResendError
+                raise RuntimeError(f"Request failed: {e}") from e
+            return response.content, response.status_code, response.headers
+
+    return SessionClient()
@@ -0,0 +1,77 @@
+"""
+Logging for the API.
+
+Records go through a QueueHandler so request threads never block on stdout; a
+QueueListener thread does the actual writing. Levels are set per module and
+debug output is sampled per request so it can be left on under load.
+
+Environment:
+    LOG_LEVEL               default level for every logger (INFO)
+    LOG_LEVELS              per-module overrides, e.g. "app=DEBUG,http_client=WARNING"
+    LOG_DEBUG_SAMPLE_RATE   fraction of requests whose debug output is kept (1.0)
+"""
+
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+_request_sampled = contextvars.ContextVar('log_request_sampled', default=None)
+_listener = None
+_debug_sample_rate = 1.0
+
+class DebugSampler(logging.Filter):
+    """Drop debug records unless the current request (or the record itself, outside requests) was sampled"""
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        sampled = _request_sampled.get()
+        if sampled is None:
+            return random.random() < _debug_sample_rate
+        return sampled
+
+def _parse_level(name, default):
+    level = logging.getLevelName(name.strip().upper())
+    return level if isinstance(level, int) else default
+
+def configure_logging():
+    """Route all logging through a background queue listener, once per process"""
+    global _listener, _debug_sample_rate
+    if _listener is not None:
+        return
+
+    _debug_sample_rate = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1.0'))
+    root = logging.getLogger()
+    root.setLevel(_parse_level(os.getenv('LOG_LEVEL', 'INFO'), logging.INFO))
+    for override in filter(None, os.getenv('LOG_LEVELS', '').split(',')):
+        module, _, level = override.partition('=')
+        logging.getLogger(module.strip()).setLevel(_parse_level(level, logging.INFO))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(DebugSampler())
+    root.handlers = [queue_handler]
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def sample_request():
+    """Decide whether this request's debug output is kept"""
+    _request_sampled.set(random.random() < _debug_sample_rate)
+
+def debug_enabled(logger):
+    """Whether a debug record from this logger would be written, to skip building expensive messages"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    sampled = _request_sampled.get()
+    return True if sampled is None else sampled
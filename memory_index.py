@@ -0,0 +1,76 @@
+"""
+Cursor pagination over memories_and_worries.
+
+Notes are kept newest first, ordered by (date, timestamp) like the records
+they come from. An index holds the positions of the notes matching a user /
+type filter together with their sort keys, so a page is found with a binary
+search instead of a scan and page N costs the same as page 1.
+
+A cursor names the last note of the previous page by its (date, timestamp)
+and how many notes with exactly that key were already returned, so it stays
+valid when new responses are added at the top.
+"""
+
+import base64
+import binascii
+from bisect import bisect_left
+
+from date_parsing import parse_date, parse_timestamp
+
+NOTE_TYPES = ('memory', 'worry', 'other')
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor this module did not produce"""
+
+def note_key(note):
+    """(date ordinal, timestamp) of a note, the order notes are listed in (descending)"""
+    return parse_date(note['date']).toordinal(), parse_timestamp(note['timestamp']).timestamp()
+
+def build_index(notes, user=None, note_type=None):
+    """Positions and negated sort keys of the notes matching the filter, in list order"""
+    positions = []
+    keys = []
+    for position, note in enumerate(notes):
+        if user is not None and note['user'] != user:
+            continue
+        if note_type is not None and note['type'] != note_type:
+            continue
+        day, timestamp = note_key(note)
+        positions.append(position)
+        # Negated so the newest-first order is ascending for bisect
+        keys.append((-day, -timestamp))
+    return {'positions': positions, 'keys': keys}
+
+def encode_cursor(key, skip):
+    return base64.urlsafe_b64encode(f"{key[0]}:{key[1]!r}:{skip}".encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(negated key, skip) from a cursor string"""
+    try:
+        text = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        day, timestamp, skip = text.split(':')
+        key, skip = (int(day), float(timestamp)), int(skip)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+    # A negative skip would start the page before the key, or wrap around to the end
+    if skip < 0:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+    return key, skip
+
+def get_page(index, notes, cursor=None, limit=50):
+    """One page of notes after the cursor and the cursor for the next page (None on the last page)"""
+    keys = index['keys']
+    start = 0
+    if cursor:
+        key, skip = decode_cursor(cursor)
+        # First note with that key, then past the ones already returned
+        start = bisect_left(keys, key) + skip
+    end = min(start + limit, len(keys))
+    page = [notes[position] for position in index['positions'][start:end]]
+
+    next_cursor = None
+    if end < len(keys) and page:
+        last_key = keys[end - 1]
+        # How many notes sharing the last key this page (and earlier ones) covered
+        next_cursor = encode_cursor(last_key, end - bisect_left(keys, last_key))
+    return page, next_cursor
@@ -0,0 +1,343 @@
+"""
+Columnar (NumPy) view of the sheet records for trend and stats computation.
+
+The store holds one row per record in sheet order, so new form responses are
+appended at the end. The day index maps a date ordinal to each user's row for
+that day, which turns "what happened on day X" into an O(1) lookup. Both are
+built once per snapshot and extended when new rows arrive, always on a copy
+so the arrays a published snapshot reads never change; trends and weekly
+stats read from them instead of rescanning the records.
+
+Each user's entry index lists the days they answered on, so the weekly stats
+can seek to the last answer before a window and fill forward from there
+without walking the history before it.
+"""
+
+import numpy as np
+
+# User ids in the 'user' column, -1 for anyone else
+USER_IDS = {'Amy': 0, 'Michael': 1}
+USERS = ('amy', 'michael')
+
+# Bits in the 'activities' column
+MINECRAFT = 1
+KISS = 2
+SLEEPOVER = 4
+
+NO_ROW = -1
+
+COLUMN_TYPES = {
+    'day': np.int32,            # date ordinal, -1 when the record has no day
+    'timestamp': np.float64,    # submission time in epoch seconds
+    'user': np.int8,
+    'strength': np.int16,
+    'stress': np.int16,
+    'hangout': np.bool_,
+    'activities': np.uint8,
+    'crashout': np.bool_,       # crash out or argument
+    'long_distance': np.bool_
+}
+
+def new_columns():
+    """Empty per-column lists to append new rows to"""
+    return {name: [] for name in COLUMN_TYPES}
+
+def new_store(capacity=256):
+    """Empty store with room for capacity rows"""
+    store = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMN_TYPES.items()}
+    store['size'] = 0
+    return store
+
+def append_rows(store, columns):
+    """A copy of the store with rows appended, and their row ids
+
+    The store passed in may belong to a published snapshot and is never
+    changed; the copy keeps spare capacity like the original.
+    """
+    size = store['size']
+    count = len(columns['day'])
+    capacity = len(store['day'])
+    grown = new_store(capacity if size + count <= capacity else max(capacity * 2, size + count))
+    for name in COLUMN_TYPES:
+        grown[name][:size] = store[name][:size]
+    grown['size'] = size
+    store = grown
+
+    for name, dtype in COLUMN_TYPES.items():
+        store[name][size:size + count] = np.asarray(columns[name], dtype=dtype)
+    store['size'] = size + count
+    return store, np.arange(size, size + count)
+
+def new_day_index():
+    """Empty day index"""
+    return {
+        'start': None,
+        'end': None,
+        'rows': np.full((0, len(USERS)), NO_ROW, dtype=np.int64)
+    }
+
+def update_day_index(index, store, new_rows):
+    """A copy of the index with each (day, user) slot pointing at its entry for the given rows
+
+    The index passed in may belong to a published snapshot and is never changed.
+
+    When a user has several entries for one day the earliest submitted wins,
+    the same entry the old per-day dict ended up with.
+    """
+    new_rows = new_rows[(store['day'][new_rows] >= 0) & (store['user'][new_rows] >= 0)]
+    if not new_rows.size:
+        return index
+
+    days = store['day'][new_rows]
+    start = int(days.min()) if index['start'] is None else min(int(days.min()), index['start'])
+    end = int(days.max()) if index['end'] is None else max(int(days.max()), index['end'])
+    if index['start'] is None or start < index['start'] or end - index['start'] >= len(index['rows']):
+        # Copy into a grid with room to keep appending days at the end
+        grown = np.full((2 * (end - start + 1), len(USERS)), NO_ROW, dtype=np.int64)
+        if index['start'] is not None:
+            offset = index['start'] - start
+            used = index['end'] - index['start'] + 1
+            grown[offset:offset + used] = index['rows'][:used]
+        index = {'start': start, 'end': end, 'rows': grown}
+    else:
+        index = {'start': index['start'], 'end': end, 'rows': index['rows'].copy()}
+
+    # Resolve each touched slot between its current entry and the new ones
+    flat = index['rows'].reshape(-1)
+    slots = (store['day'][new_rows].astype(np.int64) - index['start']) * len(USERS) + store['user'][new_rows]
+    current = flat[slots]
+    current = current[current >= 0]
+    candidates = np.concatenate([new_rows, current])
+    candidate_slots = np.concatenate([slots, (store['day'][current].astype(np.int64) - index['start']) * len(USERS) + store['user'][current]])
+    order = np.lexsort((candidates, -store['timestamp'][candidates], candidate_slots))
+    sorted_slots = candidate_slots[order]
+    winners = np.append(sorted_slots[1:] != sorted_slots[:-1], True)
+    flat[sorted_slots[winners]] = candidates[order][winners]
+    return index
+
+def get_day_rows(index, start, end):
+    """Each user's row for every day in [start, end], shape (days, users), NO_ROW if missing"""
+    grid = np.full((max(end - start + 1, 0), len(USERS)), NO_ROW, dtype=np.int64)
+    if index['start'] is None:
+        return grid
+    lo = max(start, index['start'])
+    hi = min(end, index['end'])
+    if lo <= hi:
+        grid[lo - start:hi - start + 1] = index['rows'][lo - index['start']:hi - index['start'] + 1]
+    return grid
+
+def gather(store, column, rows, fill):
+    """Look up a column for a grid of rows, using fill where the row is missing"""
+    values = store[column]
+    present = rows >= 0
+    return np.where(present, values[np.where(present, rows, 0)], fill)
+
+def build_entry_index(index):
+    """Each user's entry index: the days they answered on (ascending date ordinals) and their rows"""
+    entries = []
+    for user in range(len(USERS)):
+        if index['start'] is None:
+            days = np.zeros(0, dtype=np.int64)
+        else:
+            days = np.flatnonzero(index['rows'][:index['end'] - index['start'] + 1, user] >= 0)
+        entries.append({'days': days + (index['start'] or 0), 'rows': index['rows'][days, user]})
+    return entries
+
+def forward_fill_days(entries, start, end):
+    """Yield (day ordinal, row, carried) for every day in [start, end] from a user's entry index
+
+    row is the user's entry for that day or, with carried set, the last one
+    before it (NO_ROW when there is none yet, e.g. a user with no data). Seeking
+    to start is one binary search and every day after it one step, so any range
+    is linear in its length; rows point into the store, nothing is copied.
+    """
+    days, rows = entries['days'], entries['rows']
+    position = int(np.searchsorted(days, start))
+    row = int(rows[position - 1]) if position else NO_ROW
+    for day in range(start, end + 1):
+        if position < len(days) and days[position] == day:
+            row = int(rows[position])
+            position += 1
+            yield day, row, False
+        else:
+            yield day, row, True
+
+def _daily_trends(store, index, start, end):
+    """Per-day trend arrays for [start, end]: strength total and reporter count, per-user stress and presence, activity flags"""
+    grid = get_day_rows(index, start, end)
+    present = grid >= 0
+
+    strength = gather(store, 'strength', grid, 0).astype(np.float64)
+    hangout = gather(store, 'hangout', grid, False)
+    activities = np.where(hangout, gather(store, 'activities', grid, 0), 0)
+    activities = np.bitwise_or.reduce(activities, axis=1)
+    return {
+        'present': present,
+        'reporters': present.sum(axis=1),
+        'total_strength': np.where(present, strength, 0).sum(axis=1),
+        'stress': gather(store, 'stress', grid, 0),
+        'hangouts': hangout.any(axis=1),
+        'kisses': (activities & KISS) > 0,
+        'minecraft': (activities & MINECRAFT) > 0,
+        'crashouts_or_arguments': gather(store, 'crashout', grid, False).any(axis=1)
+    }
+
+def compute_trends(store, index, start, end):
+    """Daily strength, stress and activity series for every day in [start, end]"""
+    daily = _daily_trends(store, index, start, end)
+    present = daily['present']
+    stress = daily['stress']
+
+    # Average strength over whoever filled it out, None if nobody did
+    relationship_strength = [
+        None if count == 0 else (total / 2 if count == 2 else int(total))
+        for count, total in zip(daily['reporters'].tolist(), daily['total_strength'].tolist())
+    ]
+
+    def per_user_stress(user_index):
+        return [value if has else None
+                for value, has in zip(stress[:, user_index].tolist(), present[:, user_index].tolist())]
+
+    return {
+        'relationship_strength': relationship_strength,
+        'amy_stress': per_user_stress(0),
+        'michael_stress': per_user_stress(1),
+        'hangouts': daily['hangouts'].astype(int).tolist(),
+        'kisses': daily['kisses'].astype(int).tolist(),
+        'minecraft': daily['minecraft'].astype(int).tolist(),
+        'crashouts_or_arguments': daily['crashouts_or_arguments'].astype(int).tolist()
+    }
+
+# Date ordinal of the NumPy datetime64 epoch (1970-01-01)
+_EPOCH_ORDINAL = 719163
+
+def get_bucket_starts(start, end, resolution):
+    """Offsets (from start) of the first day of each week (Monday) or month bucket in [start, end]"""
+    ordinals = np.arange(start, end + 1)
+    if resolution == 'week':
+        # Ordinal 1 (0001-01-01) was a Monday
+        buckets = (ordinals - 1) // 7
+    else:
+        buckets = (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+
+def compute_trend_buckets(store, index, start, end, resolution):
+    """Weekly or monthly trends for [start, end]: mean strength and stress over every answer, counts of days with each activity"""
+    daily = _daily_trends(store, index, start, end)
+    starts = get_bucket_starts(start, end, resolution)
+    present = daily['present']
+
+    def bucket_mean(totals, counts):
+        totals = np.add.reduceat(totals, starts)
+        counts = np.add.reduceat(counts, starts)
+        return [None if count == 0 else round(total / count, 2) for total, count in zip(totals.tolist(), counts.tolist())]
+
+    def user_stress(user_index):
+        return bucket_mean(np.where(present[:, user_index], daily['stress'][:, user_index], 0), present[:, user_index].astype(np.int64))
+
+    def bucket_count(flags):
+        return np.add.reduceat(flags.astype(np.int64), starts).tolist()
+
+    return {
+        'starts': (start + starts).tolist(),
+        'relationship_strength': bucket_mean(daily['total_strength'], daily['reporters']),
+        'amy_stress': user_stress(0),
+        'michael_stress': user_stress(1),
+        'hangouts': bucket_count(daily['hangouts']),
+        'kisses': bucket_count(daily['kisses']),
+        'minecraft': bucket_count(daily['minecraft']),
+        'crashouts_or_arguments': bucket_count(daily['crashouts_or_arguments'])
+    }
+
+def _daily_stats(store, index, entries, start, end, default_strength, default_stress):
+    """Per-day weekly-email inputs for [start, end], carrying each user's last answers over missing days"""
+    grid = get_day_rows(index, start, end)
+    # Only the days in range are walked, the entry index finds what carries into them
+    filled = np.empty_like(grid)
+    for user, user_entries in enumerate(entries):
+        filled[:, user] = np.fromiter((row for _, row, _ in forward_fill_days(user_entries, start, end)),
+                                      dtype=np.int64, count=len(grid))
+
+    # Days without an entry only carry over long distance, strength and stress
+    hangout = gather(store, 'hangout', grid, False).any(axis=1)
+    activities = np.bitwise_or.reduce(gather(store, 'activities', grid, 0), axis=1)
+    activities = np.where(hangout, activities, 0)
+    return {
+        'hangouts': hangout,
+        'sleepovers': (activities & SLEEPOVER) > 0,
+        'kisses': (activities & KISS) > 0,
+        'minecraft': (activities & MINECRAFT) > 0,
+        'crashouts_or_arguments': gather(store, 'crashout', grid, False).any(axis=1),
+        'long_distance': gather(store, 'long_distance', filled, False).any(axis=1),
+        # Users with no answer to carry over at all fall back to the defaults
+        'strength': gather(store, 'strength', filled, default_strength),
+        'stress': gather(store, 'stress', filled, default_stress)
+    }
+
+def compute_window_stats(store, index, entries, start, end, default_strength=5, default_stress=1):
+    """Weekly-email style stats for [start, end], carrying each user's last answers over missing days"""
+    daily = _daily_stats(store, index, entries, start, end, default_strength, default_stress)
+    strength = daily['strength']
+    stress = daily['stress']
+
+    return {
+        'michael_stress_levels': stress[:, 1].tolist(),
+        'amy_stress_levels': stress[:, 0].tolist(),
+        'average_strength': float(strength.mean()) if strength.size else float(default_strength),
+        'num_hangouts': int(daily['hangouts'].sum()),
+        'num_sleepovers': int(daily['sleepovers'].sum()),
+        'num_kisses': int(daily['kisses'].sum()),
+        'num_minecraft': int(daily['minecraft'].sum()),
+        'num_crashouts_or_arguments': int(daily['crashouts_or_arguments'].sum()),
+        'num_long_distance': int(daily['long_distance'].sum())
+    }
+
+def compute_sliding_stats(store, index, entries, ends, window, default_strength=5, default_stress=1):
+    """Window stats for the window-day span ending on each of ends (date ordinals), all from one set of prefix sums
+
+    The daily inputs are built once over the union of the windows and turned
+    into running totals, so each window is a subtraction and any number of
+    windows of any length costs O(days + windows).
+    """
+    ends = np.asarray(ends, dtype=np.int64)
+    start = int(ends.min()) - window + 1
+    daily = _daily_stats(store, index, entries, start, int(ends.max()), default_strength, default_stress)
+
+    def prefix(values):
+        totals = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(values, out=totals[1:])
+        return totals
+
+    # Row i of the daily arrays is day start + i, so a window ending on e covers rows [e - window + 1, e] - start
+    hi = ends - start + 1
+    lo = hi - window
+
+    def window_sums(values):
+        totals = prefix(values)
+        return (totals[hi] - totals[lo]).tolist()
+
+    counts = {
+        'num_hangouts': window_sums(daily['hangouts']),
+        'num_sleepovers': window_sums(daily['sleepovers']),
+        'num_kisses': window_sums(daily['kisses']),
+        'num_minecraft': window_sums(daily['minecraft']),
+        'num_crashouts_or_arguments': window_sums(daily['crashouts_or_arguments']),
+        'num_long_distance': window_sums(daily['long_distance'])
+    }
+    strength = window_sums(daily['strength'].sum(axis=1))
+    amy_stress = window_sums(daily['stress'][:, 0])
+    michael_stress = window_sums(daily['stress'][:, 1])
+
+    results = []
+    for i, end in enumerate(ends.tolist()):
+        stats = {
+            'start': end - window + 1,
+            'end': end,
+            'average_strength': strength[i] / (window * len(USERS)),
+            'average_amy_stress': amy_stress[i] / window,
+            'average_michael_stress': michael_stress[i] / window
+        }
+        for name, values in counts.items():
+            stats[name] = values[i]
+        results.append(stats)
+    return results
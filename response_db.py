@@ -0,0 +1,225 @@
+"""
+SQLite store (relationship.db) the API reads form responses from.
+
+The Google Sheet is only an ingest source: the app mirrors it into the
+relationship_responses table and builds its snapshots from there, so a cold
+start or a slow/down Google never sits on the request path. The database runs
+in WAL mode so readers never wait on an ingest, and every writer bumps the
+'version' row in sync_state so readers can tell cheaply whether anything changed.
+
+Environment:
+    RESPONSE_DB_PATH    path of the SQLite file (relationship.db in the temp directory)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+
+from sheet_schema import RECORD_SCHEMA, SheetRecord
+
+# A writable, untracked location by default, the deploy directory may be read-only
+RESPONSE_DB_PATH = os.getenv('RESPONSE_DB_PATH', os.path.join(tempfile.gettempdir(), 'relationship.db'))
+
+# Record attributes are named after the table columns
+COLUMNS = tuple(RECORD_SCHEMA.values())
+INTEGER_COLUMNS = ('stress_level', 'relationship_strength')
+
+# A response is identified by who submitted it and when
+KEY_COLUMNS = ('timestamp', 'user')
+VALUE_COLUMNS = tuple(column for column in COLUMNS if column not in KEY_COLUMNS)
+
+# Questions records are keyed by when the sheet they came from is not known
+QUESTIONS = tuple(RECORD_SCHEMA.items())
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS relationship_responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    user TEXT,
+    still_like TEXT,
+    crash_out TEXT,
+    stress_level INTEGER,
+    argued TEXT,
+    period TEXT,
+    select_all_true TEXT,
+    relationship_strength INTEGER,
+    coitus TEXT,
+    coitus_quality TEXT,
+    hangout TEXT,
+    long_distance TEXT,
+    check_all_true TEXT,
+    day_for TEXT,
+    fellatio TEXT,
+    jealousy TEXT,
+    good_memory TEXT,
+    worries TEXT,
+    anything_else TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_responses_user_day ON relationship_responses (user, day_for);
+CREATE INDEX IF NOT EXISTS idx_responses_hangout_day ON relationship_responses (hangout, day_for);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+logger = logging.getLogger('response_db')
+
+# One connection per thread, sqlite3 connections are not shared across threads
+_local = threading.local()
+
+UPSERT_SQL = f'''
+INSERT INTO relationship_responses ({", ".join(COLUMNS)}) VALUES ({", ".join("?" * len(COLUMNS))})
+ON CONFLICT ({", ".join(KEY_COLUMNS)}) DO UPDATE SET
+    {", ".join(f"{column} = excluded.{column}" for column in VALUE_COLUMNS)}
+'''
+
+def ensure_unique_key(conn):
+    """Add the unique (timestamp, user) index, dropping duplicate rows left by earlier full re-imports"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_responses_timestamp_user'").fetchone()
+    if exists:
+        return
+    with conn:
+        # Keep the most recently inserted copy of each response
+        removed = conn.execute('''
+            DELETE FROM relationship_responses WHERE id NOT IN (
+                SELECT MAX(id) FROM relationship_responses GROUP BY timestamp, user
+            )
+        ''').rowcount
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_responses_timestamp_user
+            ON relationship_responses (timestamp, user)
+        ''')
+        if removed:
+            bump_version(conn)
+    if removed:
+        logger.info("Removed %d duplicate responses from %s", removed, RESPONSE_DB_PATH)
+
+def connect(path=None):
+    """Open a WAL-mode connection with the schema and indexes in place"""
+    conn = sqlite3.connect(path or RESPONSE_DB_PATH, timeout=10)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    ensure_unique_key(conn)
+    return conn
+
+def get_connection():
+    """This thread's connection to RESPONSE_DB_PATH"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = connect()
+    return conn
+
+def get_state(conn, key, default=None):
+    """Read a sync_state value"""
+    row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else default
+
+def set_state(conn, key, value):
+    """Write a sync_state value, inside the caller's transaction"""
+    conn.execute('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)', (key, str(value)))
+
+def bump_version(conn):
+    """Mark the responses as changed, inside the caller's transaction"""
+    conn.execute('''
+        INSERT INTO sync_state (key, value) VALUES ('version', '1')
+        ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+    ''')
+
+def get_version(conn=None):
+    """Counter bumped by every write to the responses, 0 for a database nothing has synced into yet"""
+    return int(get_state(conn or get_connection(), 'version', 0))
+
+def record_to_row(record):
+    """Column values for a SheetRecord, in COLUMNS order"""
+    return tuple(getattr(record, column) for column in COLUMNS)
+
+def get_questions(conn):
+    """(question, attribute) pairs of the sheet last synced, in sheet order"""
+    stored = get_state(conn, 'questions')
+    if not stored:
+        return QUESTIONS
+    return tuple((question, RECORD_SCHEMA[question]) for question in json.loads(stored) if question in RECORD_SCHEMA)
+
+def row_to_record(row, questions=QUESTIONS):
+    """Build a SheetRecord from a row of COLUMNS values"""
+    answers = dict(zip(COLUMNS, row))
+    for column in INTEGER_COLUMNS:
+        # INTEGER affinity turns '5' into 5, the sheet answer is the string
+        if answers[column] is not None:
+            answers[column] = str(answers[column])
+    return SheetRecord(questions, **answers)
+
+def load_records(conn=None):
+    """The version and all responses in sheet order, read from one consistent view of the database"""
+    conn = conn or get_connection()
+    # A read transaction so an ingest committing halfway through is not seen
+    conn.execute('BEGIN')
+    try:
+        version = get_version(conn)
+        questions = get_questions(conn)
+        rows = conn.execute(f'SELECT {", ".join(COLUMNS)} FROM relationship_responses ORDER BY id').fetchall()
+    finally:
+        conn.execute('COMMIT')
+    return version, [row_to_record(row, questions) for row in rows]
+
+def set_high_water_mark(conn, records):
+    """Remember how much of the sheet is synced, inside the caller's transaction"""
+    set_state(conn, 'synced_rows', len(records))
+    if records:
+        set_state(conn, 'last_timestamp', records[-1].timestamp)
+        set_state(conn, 'questions', json.dumps([question for question, _ in records[0].questions]))
+
+def replace_records(records, content_hash=None, conn=None):
+    """Mirror the sheet: swap every response for records in one transaction"""
+    conn = conn or get_connection()
+    with conn:
+        conn.execute('DELETE FROM relationship_responses')
+        conn.executemany(UPSERT_SQL, [record_to_row(record) for record in records])
+        set_high_water_mark(conn, records)
+        if content_hash:
+            set_state(conn, 'content_hash', content_hash)
+        bump_version(conn)
+    logger.info("Stored %d responses in %s", len(records), RESPONSE_DB_PATH)
+
+def _comparable(row):
+    # Sheet numbers may arrive as ints or strings, compare them as text
+    return tuple(None if value is None else str(value) for value in row)
+
+def sync_records(records, full=False, conn=None):
+    """Upsert the sheet rows the database does not have yet, in one transaction
+
+    Rows past the high-water mark (the number of sheet rows already synced)
+    are new. With full=True every earlier row is also compared against the
+    stored copy and the edited ones are upserted too. Returns the new and
+    changed row counts.
+    """
+    conn = conn or get_connection()
+    with conn:
+        synced_rows = int(get_state(conn, 'synced_rows', 0))
+        if synced_rows > len(records):
+            # The sheet shrank (rows deleted or re-ordered), the mark means nothing any more
+            synced_rows, full = 0, True
+
+        changed = []
+        if full and synced_rows:
+            stored = {
+                row[:len(KEY_COLUMNS)]: _comparable(row[len(KEY_COLUMNS):])
+                for row in conn.execute(f'SELECT {", ".join(KEY_COLUMNS + VALUE_COLUMNS)} FROM relationship_responses')
+            }
+            for record in records[:synced_rows]:
+                key = tuple(getattr(record, column) for column in KEY_COLUMNS)
+                if stored.get(key) != _comparable(getattr(record, column) for column in VALUE_COLUMNS):
+                    changed.append(record_to_row(record))
+
+        new = [record_to_row(record) for record in records[synced_rows:]]
+        if changed or new:
+            conn.executemany(UPSERT_SQL, changed + new)
+            bump_version(conn)
+        set_high_water_mark(conn, records)
+    return {'new': len(new), 'changed': len(changed)}
@@ -0,0 +1,119 @@
+"""
+Form questions and the compact record type built from each sheet row.
+
+Records used to be dicts keyed by the full question text (some of which run
+to 150 characters with embedded newlines). SheetRecord stores each answer in a
+__slots__ attribute with a short name instead; the question-keyed dict is only
+rebuilt by to_dict() when a record is sent out as JSON. The short names match
+the relationship_responses columns in relationship.db.
+"""
+
+from date_parsing import parse_date, parse_timestamp
+
+# Form questions
+TIMESTAMP_KEY = 'Timestamp'
+USER_KEY = 'Who is filling this out right now.'
+STILL_LIKE_KEY = 'Do you still like me? '
+CRASHOUT_KEY = "Did you have any crash outs about us? \n\nSomething counts as a crash out if you spent >30 minutes worrying about the relationship, or had a bad thought that lasted multiple days. "
+STRESS_KEY = 'How stressed are you about things outside of our relationship? '
+ARGUMENT_KEY = "Did we argue? \n\nSomething counts as an argument if one party felt anger about something, and brought it up, and it was not immediately resolved. "
+PERIOD_KEY = 'Was Amy on her period?'
+FEELINGS_KEY = 'Select all that you feel is true '
+STRENGTH_KEY = 'How strong do you think our relationship is?'
+COITUS_KEY = 'Did we have coitus during this hangout?'
+COITUS_QUALITY_KEY = 'If coitus took place, how good was the coitus for you?'
+HANGOUT_KEY = 'Did you hang out (in real life)? '
+LONG_DISTANCE_KEY = 'Are you long distance right now?'
+ACTIVITIES_KEY = 'Check all that are true for this hangout.'
+DAY_KEY = 'What day is this for? '
+FELLATIO_KEY = 'Did we do fellatio during this hangout?'
+JEALOUSY_KEY = 'If you experienced jealousy recently, what was it from?\n\nOnly fill this out once per jealous event. '
+MEMORY_KEY = "What's a good memory from this hangout (or relationship)? "
+WORRY_KEY = "What's something you're worried about? "
+OTHER_KEY = "Anything else to note?"
+
+# Question text -> SheetRecord attribute
+RECORD_SCHEMA = {
+    TIMESTAMP_KEY: 'timestamp',
+    USER_KEY: 'user',
+    STILL_LIKE_KEY: 'still_like',
+    CRASHOUT_KEY: 'crash_out',
+    STRESS_KEY: 'stress_level',
+    ARGUMENT_KEY: 'argued',
+    PERIOD_KEY: 'period',
+    FEELINGS_KEY: 'select_all_true',
+    STRENGTH_KEY: 'relationship_strength',
+    COITUS_KEY: 'coitus',
+    COITUS_QUALITY_KEY: 'coitus_quality',
+    HANGOUT_KEY: 'hangout',
+    LONG_DISTANCE_KEY: 'long_distance',
+    ACTIVITIES_KEY: 'check_all_true',
+    DAY_KEY: 'day_for',
+    FELLATIO_KEY: 'fellatio',
+    JEALOUSY_KEY: 'jealousy',
+    MEMORY_KEY: 'good_memory',
+    WORRY_KEY: 'worries',
+    OTHER_KEY: 'anything_else'
+}
+
+# (type, attribute) pairs collected into memories_and_worries, in output order
+NOTE_FIELDS = (
+    ('memory', 'good_memory'),
+    ('worry', 'worries'),
+    ('other', 'anything_else')
+)
+
+class SheetRecord:
+    """One form response, with answers in short-named slots and its dates parsed once"""
+    __slots__ = tuple(RECORD_SCHEMA.values()) + ('parsed_day', 'parsed_timestamp', 'questions', 'extra')
+
+    def __init__(self, questions=(), extra=None, **answers):
+        for attr in RECORD_SCHEMA.values():
+            setattr(self, attr, '')
+        for attr, value in answers.items():
+            setattr(self, attr, value)
+        # (question, attribute) pairs this record was read with, shared by every record of a sheet
+        self.questions = questions
+        # Answers to questions the schema does not know about yet
+        self.extra = extra
+        self.parsed_day = parse_date(self.day_for)
+        self.parsed_timestamp = parse_timestamp(self.timestamp)
+
+    def answers(self):
+        return tuple(getattr(self, attr) for attr in RECORD_SCHEMA.values()) + (self.extra,)
+
+    def __eq__(self, other):
+        if not isinstance(other, SheetRecord):
+            return NotImplemented
+        return self.answers() == other.answers()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"SheetRecord(user={self.user!r}, day_for={self.day_for!r}, timestamp={self.timestamp!r})"
+
+    def to_dict(self):
+        """The question-keyed dict the API has always returned for a record"""
+        record = {question: getattr(self, attr) for question, attr in self.questions}
+        if self.extra:
+            record.update(self.extra)
+        return record
+
+def make_record_reader(headers):
+    """Build a function turning a row of cell values (in header order) into a SheetRecord"""
+    questions = tuple((header, RECORD_SCHEMA[header]) for header in headers if header in RECORD_SCHEMA)
+    known = [RECORD_SCHEMA.get(header) for header in headers]
+
+    def read_record(values):
+        answers = {}
+        extra = None
+        for header, attr, value in zip(headers, known, values):
+            if attr:
+                answers[attr] = value
+            else:
+                if extra is None:
+                    extra = {}
+                extra[header] = value
+        return SheetRecord(questions, extra, **answers)
+
+    return read_record
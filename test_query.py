@@ -1,6 +1,8 @@
+import os
 import sqlite3
 
-conn = sqlite3.connect('relationship.db')
+# The database shipped with the repo, whatever RESPONSE_DB_PATH the app uses
+conn = sqlite3.connect(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'relationship.db'))
 cursor = conn.cursor()
 
 # Example: Get all rows
@@ -0,0 +1,41 @@
+"""Shared test setup: app state in a temp directory, and record and store factories"""
+
+import os
+import tempfile
+
+# Set before any test module imports app, so nothing reads or writes the checkout's files
+_state_dir = tempfile.mkdtemp()
+os.environ.setdefault('RESPONSE_DB_PATH', os.path.join(_state_dir, 'relationship.db'))
+os.environ.setdefault('FACE_GALLERY_PATH', os.path.join(_state_dir, 'face_gallery.npy'))
+
+import pytest
+
+import record_store
+from sheet_schema import SheetRecord
+
+# Store columns a row dict leaves out
+ROW_DEFAULTS = {'user': 0, 'strength': 5, 'stress': 1, 'hangout': False, 'activities': 0,
+                'crashout': False, 'long_distance': False}
+
+def new_record(timestamp, day_for, user='Amy', **answers):
+    """A form response, answered 'No' to long distance unless given"""
+    answers.setdefault('long_distance', 'No')
+    return SheetRecord(timestamp=timestamp, user=user, day_for=day_for, **answers)
+
+def new_store(rows):
+    """Record store, day index and entry index for row dicts, submitted in order"""
+    columns = record_store.new_columns()
+    for position, row in enumerate(rows):
+        for name in record_store.COLUMN_TYPES:
+            columns[name].append(row.get(name, float(position) if name == 'timestamp' else ROW_DEFAULTS.get(name)))
+    store, new_rows = record_store.append_rows(record_store.new_store(), columns)
+    index = record_store.update_day_index(record_store.new_day_index(), store, new_rows)
+    return store, index, record_store.build_entry_index(index)
+
+@pytest.fixture
+def make_record():
+    return new_record
+
+@pytest.fixture
+def make_store():
+    return new_store
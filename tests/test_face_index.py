@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+import face_gallery
+import face_index
+
+def make_gallery(count=600, dim=16, seed=3):
+    rng = np.random.default_rng(seed)
+    return face_gallery.new_gallery([f'face-{row}' for row in range(count)], rng.normal(size=(count, dim)))
+
+def make_queries(count=25, dim=16, seed=4):
+    return np.random.default_rng(seed).normal(size=(count, dim)).tolist()
+
+def test_probing_every_list_matches_exact_search():
+    exact = make_gallery()
+    indexed = dict(exact, index=face_index.build_index(exact['matrix'], n_lists=12))
+    queries = make_queries()
+
+    expected = face_gallery.match_faces(exact, queries, 5)
+    found = face_gallery.match_faces(indexed, queries, 5, probes=12)
+    for expected_matches, found_matches in zip(expected, found):
+        assert [face_id for face_id, _ in found_matches] == [face_id for face_id, _ in expected_matches]
+        assert [score for _, score in found_matches] == pytest.approx([score for _, score in expected_matches], abs=1e-5)
+
+def test_few_probes_return_valid_candidates():
+    gallery = make_gallery()
+    index = face_index.build_index(gallery['matrix'], n_lists=12)
+    queries = face_gallery.normalize_rows(np.array(make_queries(), dtype=np.float32))
+    columns, scores = face_index.search(index, queries, 5, probes=1)
+    found = columns >= 0
+    assert found.any(axis=1).all()
+    # Every reported score is the real similarity of the row it names
+    rows = np.where(found, columns, 0)
+    real = np.einsum('qd,qkd->qk', queries, np.asarray(gallery['matrix'])[rows])
+    assert np.allclose(scores[found], real[found], atol=1e-5)
+    # Best first
+    for face_scores, face_found in zip(scores, found):
+        assert np.all(np.diff(face_scores[face_found]) <= 1e-6)
@@ -0,0 +1,66 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+
+import app
+import face_gallery
+
+def post_faces(body):
+    client = app.app.test_client()
+    return client.post('/face-match', data=body, content_type='application/json')
+
+def test_non_finite_embedding_is_rejected():
+    embedding = list(face_gallery.DEFAULT_REFERENCE)
+    embedding[0] = float('nan')
+    # json.dumps writes the NaN literal browsers and Python clients send
+    response = post_faces(json.dumps({'faces': [{'embedding': embedding}]}))
+    assert response.status_code == 400
+    assert 'NaN' in json.loads(response.get_data())['error']
+
+def test_bool_top_k_and_probes_name_the_parameter():
+    faces = [{'embedding': face_gallery.DEFAULT_REFERENCE}]
+    response = post_faces(json.dumps({'faces': faces, 'top_k': True}))
+    assert response.status_code == 400
+    assert 'top_k' in response.get_json()['error']
+    response = post_faces(json.dumps({'faces': faces, 'probes': True}))
+    assert response.status_code == 400
+    assert 'probes' in response.get_json()['error']
+
+def test_finite_embedding_matches():
+    response = post_faces(json.dumps({'faces': [{'embedding': face_gallery.DEFAULT_REFERENCE}]}))
+    assert response.status_code == 200
+
+def pack(embeddings, count=None, dim=None):
+    matrix = np.asarray(embeddings, dtype='<f4')
+    header = face_gallery.PACKED_HEADER.pack(len(matrix) if count is None else count,
+                                             matrix.shape[1] if dim is None else dim)
+    return header + matrix.tobytes()
+
+def post_packed(body, query=''):
+    client = app.app.test_client()
+    return client.post(f'/face-match{query}', data=body, content_type='application/octet-stream')
+
+def test_packed_embeddings_match_like_json():
+    embeddings = [face_gallery.DEFAULT_REFERENCE, [value + 5 for value in face_gallery.DEFAULT_REFERENCE]]
+    packed = post_packed(pack(embeddings), '?top_k=1')
+    assert packed.status_code == 200
+    as_json = post_faces(json.dumps({'faces': [{'embedding': embedding} for embedding in embeddings], 'top_k': 1}))
+    assert ([result['matches'] for result in packed.get_json()['results']]
+            == [result['matches'] for result in as_json.get_json()['results']])
+
+@pytest.mark.parametrize('body', [
+    b'\x01\x00',                                                   # shorter than the header
+    pack([face_gallery.DEFAULT_REFERENCE], count=2),               # header says more faces than sent
+    pack([face_gallery.DEFAULT_REFERENCE])[:-4],                   # truncated values
+    pack([face_gallery.DEFAULT_REFERENCE]) + b'\x00\x00\x00\x00',  # trailing bytes
+])
+def test_packed_body_not_matching_its_header_is_rejected(body):
+    response = post_packed(body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_packed_base64_in_json_is_checked_too():
+    body = base64.b64encode(pack([face_gallery.DEFAULT_REFERENCE], count=3)).decode()
+    assert post_faces(json.dumps({'embeddings': body})).status_code == 400
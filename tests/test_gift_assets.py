@@ -0,0 +1,82 @@
+import io
+
+import numpy as np
+import pytest
+
+import app
+import gift_assets
+
+SKIN = bytes(range(256)) * 16
+
+@pytest.fixture
+def assets(tmp_path, monkeypatch):
+    """Serve the assets from a temp directory for one test"""
+    directory = tmp_path / 'gift-assets'
+    directory.mkdir()
+    (directory / 'skin.bin').write_bytes(SKIN)
+    monkeypatch.setattr(gift_assets, 'GIFT_VARIANTS_DIR', str(tmp_path / 'variants'))
+    yield directory
+    gift_assets.load_assets()
+
+def get(url, **headers):
+    return app.app.test_client().get(url, headers=headers)
+
+def test_fingerprinted_url_is_immutable(assets):
+    gift_assets.load_assets(str(assets))
+    response = get('/' + gift_assets.get_asset_url('skin.bin'))
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == gift_assets.IMMUTABLE_MAX_AGE
+
+    # Without the fingerprint (or with a stale one) it must be revalidated
+    for url in ('/gift-assets/skin.bin', '/gift-assets/skin.bin?v=stale'):
+        response = get(url)
+        assert not response.cache_control.immutable
+        assert response.cache_control.no_cache
+
+def test_range_and_if_none_match(assets):
+    gift_assets.load_assets(str(assets))
+    response = get('/gift-assets/skin.bin', Range='bytes=100-199')
+    assert response.status_code == 206
+    assert response.get_data() == SKIN[100:200]
+
+    etag = get('/gift-assets/skin.bin').headers['ETag']
+    assert get('/gift-assets/skin.bin', **{'If-None-Match': etag}).status_code == 304
+    # If-Range with an old ETag sends the whole file again
+    response = get('/gift-assets/skin.bin', Range='bytes=100-199', **{'If-Range': '"old"'})
+    assert response.status_code == 200
+    assert response.get_data() == SKIN
+
+@pytest.fixture
+def photo(assets):
+    """A noisy PNG big enough to get variants"""
+    Image = pytest.importorskip('PIL.Image')
+    pixels = np.random.default_rng(0).integers(0, 256, size=(300, 500, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(assets / 'photo.png')
+    gift_assets.load_assets(str(assets))
+    assert gift_assets.get_asset('photo.png')['width'] == 500
+    return Image
+
+def open_image(Image, response):
+    return Image.open(io.BytesIO(response.get_data()))
+
+def test_width_snaps_up_to_a_configured_width(photo):
+    response = get('/gift-assets/photo.png?w=300')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert open_image(photo, response).width == 400
+    # Wider than every variant smaller than the image, so the original
+    assert open_image(photo, get('/gift-assets/photo.png?w=450')).width == 500
+    assert get('/gift-assets/photo.png?w=300').headers['ETag'] != get('/gift-assets/photo.png').headers['ETag']
+
+def test_accept_webp_gets_a_webp_variant(photo):
+    if 'webp' not in gift_assets.get_variant_formats():
+        pytest.skip("Pillow was built without WebP")
+    response = get('/gift-assets/photo.png?w=200', Accept='image/webp,*/*')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    image = open_image(photo, response)
+    assert (image.format, image.width) == ('WEBP', 200)
+    assert 'Accept' in response.vary
+    # A client that names no image type keeps the original format
+    assert get('/gift-assets/photo.png?w=200', Accept='*/*').mimetype == 'image/png'
@@ -0,0 +1,45 @@
+import pytest
+
+import memory_index
+
+def make_note(day, time='20:00:00', user='Amy', note_type='memory'):
+    return {'date': f'10/{day:02d}/2026', 'timestamp': f'10/{day:02d}/2026 {time}', 'user': user, 'type': note_type,
+            'text': f'{day} {time} {user}'}
+
+def read_pages(index, notes, limit, cursor=None):
+    pages = []
+    while True:
+        page, cursor = memory_index.get_page(index, notes, cursor, limit)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+def test_pages_cover_every_note_once_across_ties():
+    # Newest first, with runs of notes that share a (date, timestamp) key
+    notes = [make_note(9)] + [make_note(8, user=user) for user in ('Amy', 'Michael') * 3] + [make_note(7), make_note(7)]
+    index = memory_index.build_index(notes)
+    for limit in (1, 2, 3, 4, 10):
+        pages = read_pages(index, notes, limit)
+        assert [note for page in pages for note in page] == notes
+        assert all(len(page) == limit for page in pages[:-1])
+
+def test_filtered_pages():
+    notes = [make_note(9, user='Michael'), make_note(8), make_note(7, user='Michael'), make_note(6, note_type='worry')]
+    index = memory_index.build_index(notes, user='Michael')
+    assert read_pages(index, notes, 1) == [[notes[0]], [notes[2]]]
+
+def test_cursor_stays_valid_after_new_notes_arrive():
+    notes = [make_note(5), make_note(5), make_note(5), make_note(4)]
+    page, cursor = memory_index.get_page(memory_index.build_index(notes), notes, limit=2)
+    assert page == notes[:2]
+
+    # The next snapshot has newer notes at the top
+    newer = [make_note(9), make_note(6)] + notes
+    page, cursor = memory_index.get_page(memory_index.build_index(newer), newer, cursor, limit=2)
+    assert page == notes[2:]
+    assert cursor is None
+
+@pytest.mark.parametrize('cursor', ['not a cursor', memory_index.encode_cursor((-739000, -1.0), -1), '!!!'])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(memory_index.InvalidCursor):
+        memory_index.decode_cursor(cursor)
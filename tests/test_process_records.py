@@ -0,0 +1,28 @@
+import numpy as np
+
+import app
+
+def make_records(make_record, days, user='Amy'):
+    return [
+        make_record(f'10/{day:02d}/2026 20:00:00', f'10/{day:02d}/2026', user,
+                    hangout='Yes', relationship_strength='7', stress_level='2')
+        for day in days
+    ]
+
+def test_incremental_rebuild_leaves_previous_snapshot_unchanged(make_record):
+    records = make_records(make_record, range(1, 11))
+    previous = app.process_records(records)
+    store, day_index = previous['record_store'], previous['day_index']
+    columns = {name: store[name].copy() for name in ('day', 'timestamp', 'user', 'strength')}
+    size, index_rows, index_end = store['size'], day_index['rows'].copy(), day_index['end']
+    status = app.get_status(previous)
+
+    updated = app.process_records(records + make_records(make_record, range(11, 21), 'Michael'), previous)
+
+    assert updated['record_store']['size'] == size + 10
+    assert store['size'] == size
+    for name, values in columns.items():
+        assert np.array_equal(store[name], values)
+    assert day_index['end'] == index_end
+    assert np.array_equal(day_index['rows'], index_rows)
+    assert app.get_status(previous) == status
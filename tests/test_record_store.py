@@ -0,0 +1,67 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import record_store
+
+DAY = 739000
+
+def test_forward_fill_days_carries_the_last_entry(make_store):
+    store, index, entries = make_store([{'day': DAY, 'strength': 7}, {'day': DAY + 3, 'strength': 9}])
+    filled = list(record_store.forward_fill_days(entries[0], DAY + 1, DAY + 4))
+    assert [(day - DAY, carried) for day, _, carried in filled] == [(1, True), (2, True), (3, False), (4, True)]
+    assert [int(store['strength'][row]) for _, row, _ in filled] == [7, 7, 9, 9]
+
+def test_forward_fill_days_before_any_entry_and_without_data(make_store):
+    _, _, entries = make_store([{'day': DAY}])
+    assert [row for _, row, _ in record_store.forward_fill_days(entries[0], DAY - 2, DAY - 1)] == [record_store.NO_ROW] * 2
+    # Michael never answered
+    assert {row for _, row, _ in record_store.forward_fill_days(entries[1], DAY - 2, DAY + 2)} == {record_store.NO_ROW}
+
+def test_window_stats_use_answers_from_before_the_window(make_store):
+    store, index, entries = make_store([{'day': DAY, 'user': 0, 'strength': 10}, {'day': DAY, 'user': 1, 'strength': 6}])
+    stats = record_store.compute_window_stats(store, index, entries, DAY + 30, DAY + 36)
+    assert stats['average_strength'] == 8.0
+
+def test_month_buckets_split_on_the_first_of_the_month(make_store):
+    start, end = date(2026, 1, 30).toordinal(), date(2026, 3, 2).toordinal()
+    assert (start + record_store.get_bucket_starts(start, end, 'month')).tolist() == [
+        start, date(2026, 2, 1).toordinal(), date(2026, 3, 1).toordinal()]
+
+    store, index, _ = make_store([
+        {'day': date(2026, 1, 31).toordinal(), 'hangout': True, 'strength': 8},
+        {'day': date(2026, 2, 1).toordinal(), 'hangout': True, 'strength': 6},
+        {'day': date(2026, 2, 28).toordinal(), 'strength': 4},
+    ])
+    buckets = record_store.compute_trend_buckets(store, index, start, end, 'month')
+    assert buckets['hangouts'] == [1, 1, 0]
+    assert buckets['relationship_strength'] == [8.0, 5.0, None]
+
+def test_week_buckets_start_on_monday():
+    # Sunday 2026-10-11 to Monday 2026-10-19
+    start, end = date(2026, 10, 11).toordinal(), date(2026, 10, 19).toordinal()
+    starts = (start + record_store.get_bucket_starts(start, end, 'week')).tolist()
+    assert starts == [start, date(2026, 10, 12).toordinal(), date(2026, 10, 19).toordinal()]
+    assert all(date.fromordinal(day).weekday() == 0 for day in starts[1:])
+
+def test_sliding_stats_match_window_stats(make_store):
+    rng = np.random.default_rng(7)
+    rows = [
+        {'day': DAY + int(rng.integers(0, 60)), 'user': int(rng.integers(0, 2)), 'strength': int(rng.integers(1, 11)),
+         'stress': int(rng.integers(1, 11)), 'hangout': bool(rng.integers(0, 2)), 'activities': int(rng.integers(0, 8)),
+         'crashout': bool(rng.integers(0, 2)), 'long_distance': bool(rng.integers(0, 2))}
+        for _ in range(80)
+    ]
+    store, index, entries = make_store(rows)
+    # Windows starting before the first answer, inside the history and past its end
+    ends = list(range(DAY - 3, DAY + 70, 4))
+    for window in (1, 7, 30):
+        for stats in record_store.compute_sliding_stats(store, index, entries, ends, window):
+            expected = record_store.compute_window_stats(store, index, entries, stats['start'], stats['end'])
+            for name in ('num_hangouts', 'num_sleepovers', 'num_kisses', 'num_minecraft',
+                         'num_crashouts_or_arguments', 'num_long_distance'):
+                assert stats[name] == expected[name]
+            assert stats['average_strength'] == pytest.approx(expected['average_strength'])
+            assert stats['average_amy_stress'] == pytest.approx(np.mean(expected['amy_stress_levels']))
+            assert stats['average_michael_stress'] == pytest.approx(np.mean(expected['michael_stress_levels']))
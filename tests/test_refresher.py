@@ -0,0 +1,6 @@
+import app
+
+def test_refresh_delay_stays_capped_after_many_failures():
+    limit = max(app.SHEET_REFRESH_BACKOFF_MAX, app.SHEET_REFRESH_INTERVAL) * (1 + app.SHEET_REFRESH_JITTER)
+    for failures in (0, 5, 1100, 10 ** 6):
+        assert 0 < app.get_refresh_delay(failures) <= limit
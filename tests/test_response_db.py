@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import tempfile
+
+import app
+import response_db
+
+def test_unsynced_database_is_not_published(monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(), 'legacy.db')
+    conn = response_db.connect(path)
+    # Rows left by an old import, with no sync ever recorded
+    with conn:
+        conn.execute("INSERT INTO relationship_responses (timestamp, user, hangout) VALUES ('10/01/2026 20:00:00', NULL, 'YES')")
+    monkeypatch.setattr(response_db, 'RESPONSE_DB_PATH', path)
+    monkeypatch.setattr(response_db._local, 'conn', conn, raising=False)
+
+    assert response_db.get_version() == 0
+    assert app.load_snapshot() is None
+
+def get_stored(conn):
+    return conn.execute('SELECT timestamp, user, hangout FROM relationship_responses ORDER BY id').fetchall()
+
+def test_sync_only_upserts_rows_past_the_high_water_mark(tmp_path, make_record):
+    conn = response_db.connect(str(tmp_path / 'sync.db'))
+    records = [make_record(f'10/0{day}/2026 20:00:00', f'10/0{day}/2026', hangout='Yes') for day in range(1, 4)]
+    assert response_db.sync_records(records, conn=conn) == {'new': 3, 'changed': 0}
+    version = response_db.get_version(conn)
+
+    assert response_db.sync_records(records, conn=conn) == {'new': 0, 'changed': 0}
+    assert response_db.get_version(conn) == version
+
+    records.append(make_record('10/04/2026 20:00:00', '10/04/2026', hangout='No'))
+    assert response_db.sync_records(records, conn=conn) == {'new': 1, 'changed': 0}
+    assert response_db.get_version(conn) == version + 1
+    assert response_db.get_state(conn, 'synced_rows') == '4'
+    assert len(get_stored(conn)) == 4
+
+def test_sync_upserts_on_timestamp_and_user(tmp_path, make_record):
+    conn = response_db.connect(str(tmp_path / 'sync.db'))
+    first = make_record('10/01/2026 20:00:00', '10/01/2026', hangout='No')
+    response_db.sync_records([first], conn=conn)
+    # The same response again, after a row that did not count, e.g. a re-import with edits
+    again = make_record('10/01/2026 20:00:00', '10/01/2026', hangout='Yes')
+    other_user = make_record('10/01/2026 20:00:00', '10/01/2026', 'Michael', hangout='No')
+    assert response_db.sync_records([first, again, other_user], conn=conn) == {'new': 2, 'changed': 0}
+    assert get_stored(conn) == [('10/01/2026 20:00:00', 'Amy', 'Yes'), ('10/01/2026 20:00:00', 'Michael', 'No')]
+
+def test_full_sync_finds_edited_rows(tmp_path, make_record):
+    conn = response_db.connect(str(tmp_path / 'sync.db'))
+    records = [make_record(f'10/0{day}/2026 20:00:00', f'10/0{day}/2026', hangout='No') for day in range(1, 4)]
+    response_db.sync_records(records, conn=conn)
+
+    records[1] = make_record('10/02/2026 20:00:00', '10/02/2026', hangout='Yes')
+    assert response_db.sync_records(records, conn=conn) == {'new': 0, 'changed': 0}
+    assert response_db.sync_records(records, full=True, conn=conn) == {'new': 0, 'changed': 1}
+    assert get_stored(conn)[1] == ('10/02/2026 20:00:00', 'Amy', 'Yes')
+
+def test_sync_after_the_sheet_shrank_upserts_every_row(tmp_path, make_record):
+    conn = response_db.connect(str(tmp_path / 'sync.db'))
+    records = [make_record(f'10/0{day}/2026 20:00:00', f'10/0{day}/2026', hangout='No') for day in range(1, 4)]
+    response_db.sync_records(records, conn=conn)
+
+    # A row deleted and another edited: the old mark (3) is past the end of the sheet
+    records = [records[0], make_record('10/03/2026 20:00:00', '10/03/2026', hangout='Yes')]
+    # Nothing is known to be synced any more, so the whole sheet is upserted again
+    assert response_db.sync_records(records, conn=conn) == {'new': 2, 'changed': 0}
+    assert response_db.get_state(conn, 'synced_rows') == '2'
+    assert get_stored(conn)[2] == ('10/03/2026 20:00:00', 'Amy', 'Yes')
+
+def test_unique_key_keeps_the_latest_copy_of_duplicates(tmp_path):
+    path = str(tmp_path / 'duplicates.db')
+    # A database from before the unique key, with a response imported twice
+    conn = sqlite3.connect(path)
+    conn.executescript(response_db.SCHEMA)
+    with conn:
+        conn.executemany("INSERT INTO relationship_responses (timestamp, user, hangout) VALUES (?, ?, ?)", [
+            ('10/01/2026 20:00:00', 'Amy', 'No'),
+            ('10/01/2026 20:00:00', 'Michael', 'No'),
+            ('10/01/2026 20:00:00', 'Amy', 'Yes'),
+        ])
+    conn.close()
+
+    conn = response_db.connect(path)
+    assert get_stored(conn) == [('10/01/2026 20:00:00', 'Michael', 'No'), ('10/01/2026 20:00:00', 'Amy', 'Yes')]
+    assert response_db.get_version(conn) == 1
+    # Only once, the index is in place now
+    response_db.ensure_unique_key(conn)
+    assert response_db.get_version(conn) == 1
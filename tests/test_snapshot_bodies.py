@@ -0,0 +1,30 @@
+import app
+import compression
+import response_db
+
+def make_records(make_record):
+    return [make_record('10/13/2026 18:09:00', '10/13/2026', hangout='Yes', check_all_true='We held hands and kissed')]
+
+def record_levels(monkeypatch):
+    levels = []
+    compress_variants = compression.compress_variants
+    def spy(body, levels_used=compression.SNAPSHOT_LEVELS):
+        levels.append(levels_used)
+        return compress_variants(body, levels_used)
+    monkeypatch.setattr(compression, 'compress_variants', spy)
+    return levels
+
+def test_fixed_bodies_are_encoded_with_the_snapshot(monkeypatch, make_record):
+    records = make_records(make_record)
+    monkeypatch.setattr(response_db, 'load_records', lambda: (1, records))
+    levels = record_levels(monkeypatch)
+    snapshot = app.load_snapshot()
+    assert set(snapshot['bodies']) == {('hangout_data', app.HANGOUT_DATA_FIELDS), 'status', 'last_entries'}
+    assert levels == [compression.SNAPSHOT_LEVELS] * 3
+
+def test_fields_selection_uses_request_levels(monkeypatch, make_record):
+    records = make_records(make_record)
+    snapshot = app.new_snapshot(1, 0, records, app.process_records(records))
+    levels = record_levels(monkeypatch)
+    app.get_snapshot_body(snapshot, 'hangout_data', ('status',))
+    assert levels == [compression.RESPONSE_LEVELS]
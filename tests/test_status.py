@@ -0,0 +1,14 @@
+import app
+
+def test_same_day_correction_sets_last_kiss_date(make_record):
+    records = [
+        make_record('10/11/2026 20:00:00', '10/11/2026', hangout='Yes', check_all_true='We held hands and kissed'),
+        # "No" in the afternoon, corrected to a kiss that evening
+        make_record('10/13/2026 15:51:00', '10/13/2026', hangout='No'),
+        make_record('10/13/2026 18:09:00', '10/13/2026', hangout='Yes',
+                    check_all_true='We held hands and kissed, We played Minecraft'),
+    ]
+    status = app.get_status(app.process_records(records))
+    assert status['last_kiss_date'] == '10/13/2026'
+    assert status['last_hangout_date'] == '10/13/2026'
+    assert status['last_minecraft_date'] == '10/13/2026'
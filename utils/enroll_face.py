@@ -0,0 +1,30 @@
+import argparse
+import json
+import os
+import sys
+
+# face_gallery lives in the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import face_gallery
+
+parser = argparse.ArgumentParser(description='Append reference faces to the /face-match gallery')
+parser.add_argument('--gallery', default=face_gallery.FACE_GALLERY_PATH, help='.npy gallery file to append to')
+parser.add_argument('--id', help='id of the face given with --embedding')
+parser.add_argument('--embedding', help='JSON list of numbers, e.g. "[100.0, 100.0, 80.0, ...]"')
+parser.add_argument('--file', help='JSON file with a list of {"id": ..., "embedding": [...]} faces')
+args = parser.parse_args()
+
+faces = []
+if args.file:
+    with open(args.file) as faces_file:
+        faces.extend(json.load(faces_file))
+if args.embedding:
+    if not args.id:
+        parser.error('--embedding needs an --id')
+    faces.append({'id': args.id, 'embedding': json.loads(args.embedding)})
+if not faces:
+    parser.error('give --id and --embedding, or --file')
+
+gallery_size = face_gallery.enroll([face['id'] for face in faces], [face['embedding'] for face in faces], args.gallery)
+print(f"Enrolled {len(faces)} faces into {args.gallery} ({gallery_size} in the gallery)")
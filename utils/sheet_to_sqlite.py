@@ -1,70 +1,35 @@
-import sqlite3
-from format_sheet import responses  # Assumes format_sheet.py defines 'responses' at the top level
+import argparse
+import os
+import sys
+import time
 
-# Connect to SQLite database (creates file if it doesn't exist)
-conn = sqlite3.connect('relationship.db')
-cursor = conn.cursor()
+# response_db and sheet_schema live in the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Create table (run once)
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS relationship_responses (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    timestamp TEXT,
-    user TEXT,
-    still_like TEXT,
-    crash_out TEXT,
-    stress_level INTEGER,
-    argued TEXT,
-    period TEXT,
-    select_all_true TEXT,
-    relationship_strength INTEGER,
-    coitus TEXT,
-    coitus_quality TEXT,
-    hangout TEXT,
-    long_distance TEXT,
-    check_all_true TEXT,
-    day_for TEXT,
-    fellatio TEXT,
-    jealousy TEXT,
-    good_memory TEXT,
-    worries TEXT,
-    anything_else TEXT
-)
-''')
+import response_db
+from sheet_schema import make_record_reader
 
-# Insert data
-for row in responses:
-    cursor.execute('''
-        INSERT INTO relationship_responses (
-            timestamp, still_like, crash_out, stress_level, argued, period,
-            select_all_true, relationship_strength, coitus, coitus_quality,
-            hangout, long_distance, check_all_true, day_for, user,
-            fellatio, jealousy, good_memory, worries, anything_else
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        row.get('Timestamp'),
-        row.get('Do you still like me? '),
-        row.get('Did you have any crash outs about us? \n\nSomething counts as a crash out if you spent >30 minutes worrying about the relationship, or had a bad thought that lasted multiple days. '),
-        row.get('How stressed are you about things outside of our relationship? '),
-        row.get('Did we argue? \n\nSomething counts as an argument if one party felt anger about something, and brought it up, and it was not immediately resolved. '),
-        row.get('Was Amy on her period?'),
-        ', '.join(row.get('Select all that you feel is true ', [])) if isinstance(row.get('Select all that you feel is true '), list) else row.get('Select all that you feel is true '),
-        row.get('How strong do you think our relationship is?'),
-        row.get('Did we have coitus during this hangout?'),
-        row.get('If coitus took place, how good was the coitus for you?'),
-        row.get('Did you hang out (in real life)? '),
-        row.get('Are you long distance right now?'),
-        ', '.join(row.get('Check all that are true for this hangout.', [])) if isinstance(row.get('Check all that are true for this hangout.'), list) else row.get('Check all that are true for this hangout.'),
-        row.get('What day is this for? '),
-        row.get('Who is filling this out right now.'),
-        row.get('Did we do fellatio during this hangout?'),
-        row.get('If you experienced jealousy recently, what was it from?\n\nOnly fill this out once per jealous event. '),
-        row.get("What's a good memory from this hangout (or relationship)? "),
-        row.get("What's something you're worried about? "),
-        row.get('Anything else to note?')
-    ))
+parser = argparse.ArgumentParser(description='Sync the form responses sheet into relationship.db')
+parser.add_argument('--db', default=response_db.RESPONSE_DB_PATH, help='SQLite file to sync into')
+parser.add_argument('--full', action='store_true', help='also re-check already synced rows and upsert the edited ones')
+args = parser.parse_args()
 
-conn.commit()
+from format_sheet import raw_responses  # Assumes format_sheet.py defines 'raw_responses' at the top level
+
+started = time.perf_counter()
+
+# Store the raw sheet answers, the same values the API ingests and reads back
+records = []
+if raw_responses:
+    headers = list(raw_responses[0])
+    read_record = make_record_reader(headers)
+    records = [read_record([row.get(header, '') for header in headers]) for row in raw_responses]
+
+# Connect to SQLite database (creates file, schema and indexes if they don't exist)
+conn = response_db.connect(args.db)
+counts = response_db.sync_records(records, full=args.full, conn=conn)
 conn.close()
 
-print('Data loaded into relationship.db')
+elapsed = time.perf_counter() - started
+print(f"Synced {counts['new'] + counts['changed']} rows into {args.db} "
+      f"({counts['new']} new, {counts['changed']} changed, {len(records)} in the sheet) in {elapsed:.2f}s")